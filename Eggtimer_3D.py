@@ -6,11 +6,14 @@
 # -----------------------------------------------------------------------------------------------------------------------------
 # Code
 import sys
-import pandas as pd
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QLabel, QHBoxLayout, QComboBox)
 from PyQt5.QtCore import QTimer
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
+
+from flight_log import flight_log_path
+from flight_replay import FlightReplay
+from replay_timeline import ReplayTimeline
 from mpl_toolkits.mplot3d import Axes3D
 
 
@@ -66,12 +69,12 @@ class PLOTSGroundStation(QMainWindow):
         super().__init__()
         self.setWindowTitle("LASER Mission Control - PLOTS Ground Station")
         self.resize(1024, 600)
-        self.data = pd.read_csv(FLIGHT_DATA_PATH)
-        self.index = 0
+        # Converted once to NumPy columns; ticks only slice them
+        self.replay = FlightReplay.from_file(flight_log_path(FLIGHT_DATA_PATH))
         self.canvas = PlotLiveCanvas()
         self.canvas3D = PlotLive3D()
         self.variable_select = QComboBox(self)
-        self.variable_select.addItems(self.data.columns[1:])
+        self.variable_select.addItems(self.replay.names[1:])
         self.variable_select.currentTextChanged.connect(self.changePlotVariable)
 
         h_layout = QHBoxLayout()
@@ -88,41 +91,45 @@ class PLOTSGroundStation(QMainWindow):
         self.timer = QTimer()
         self.timer.timeout.connect(self.readNextPacket)
         self.timer.start(INTERVAL_MS)
+
+        # Seeks rebuild every plot from the column views in one step
+        self.timeline = ReplayTimeline(self.replay, self.timer)
+        self.timeline.seeked.connect(self.showHistory)
+        layout.addWidget(self.timeline)
         self.selected_variable = 'Alt'
         self.initializeData()
 
     def initializeData(self):
-        self.canvas.times = self.data["T"].values.tolist()[:10]
-        self.canvas.data_values = self.data[self.selected_variable].values.tolist()[:10]
-        self.canvas.updatePlot()
-        self.canvas3D.times = self.data["T"].values.tolist()[:10]
-        self.canvas3D.altitudes = self.data["Alt"].values.tolist()[:10]
-        self.canvas3D.velocities = self.data["Veloc"].values.tolist()[:10]
-        self.canvas3D.updatePlot()
+        self.replay.seek(10)
+        self.showHistory()
 
     def changePlotVariable(self, variable):
         self.selected_variable = variable
         self.canvas.ax.set_ylabel(variable)
         self.canvas.ax.set_title(f"{variable} vs Time")
-        self.canvas.data_values = self.data[self.selected_variable].values.tolist()[:self.index + 10]
+        self.canvas.data_values = self.replay.history(self.selected_variable)
         self.canvas.updatePlot()
 
+    def showHistory(self):
+        t = self.replay.history("T")
+        self.canvas.times = t
+        self.canvas.data_values = self.replay.history(self.selected_variable)
+        self.canvas.updatePlot()
+
+        self.canvas3D.times = t
+        self.canvas3D.altitudes = self.replay.history("Alt")
+        self.canvas3D.velocities = self.replay.history("Veloc")
+        self.canvas3D.updatePlot()
+
     def readNextPacket(self):
-        if self.index < len(self.data):
-            time = self.data.iloc[self.index]["T"]
-            altitude = self.data.iloc[self.index]["Alt"]
-            velocity = self.data.iloc[self.index]["Veloc"]
-            self.canvas.times.append(time)
-            self.canvas.data_values.append(self.data.iloc[self.index][self.selected_variable])
-            self.canvas.updatePlot()
-            
-            self.canvas3D.times.append(time)
-            self.canvas3D.altitudes.append(altitude)
-            self.canvas3D.velocities.append(velocity)
-            self.canvas3D.updatePlot()
-            self.index = self.index + 1
-        else:
+        if self.replay.finished:
             self.timer.stop()
+            self.timeline.sync()
+            return
+        rows = self.replay.tick()
+        if rows.start != rows.stop:
+            self.showHistory()
+        self.timeline.sync()
 
 
 if __name__ == "__main__":
@@ -6,12 +6,15 @@
 # -----------------------------------------------------------------------------------------------------------------------------
 # Code
 import sys
-import pandas as pd
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QComboBox)
 from PyQt5.QtCore import QTimer
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 
+from flight_log import flight_log_path
+from flight_replay import FlightReplay
+from replay_timeline import ReplayTimeline
+
 FLIGHT_DATA_PATH = "/home/admin/PLOTS-DEV/dtl3.csv"
 INTERVAL_MS = 30
 
@@ -50,7 +53,7 @@ class PlotLive2D(FigureCanvas):
         self.values = []
 
     def updatePlot(self):
-        if not self.times:
+        if len(self.times) == 0:
             return
         self.line.set_data(self.times, self.values)
         self.ax.relim()
@@ -83,8 +86,8 @@ class PLOTSGroundStation(QMainWindow):
         self.setWindowTitle("LASER Mission Control - PLOTS Ground Station")
         self.resize(1200, 700)
 
-        self.data = pd.read_csv(FLIGHT_DATA_PATH)
-        self.index = 0
+        # Converted once to NumPy columns; ticks only slice them
+        self.replay = FlightReplay.from_file(flight_log_path(FLIGHT_DATA_PATH))
 
         self.plot2D_top = PlotLive2D("Alt vs Time")
         self.plot2D_bottom = PlotLive2D("Alt vs Time")
@@ -92,8 +95,8 @@ class PLOTSGroundStation(QMainWindow):
 
         self.combo_top = QComboBox()
         self.combo_bottom = QComboBox()
-        self.combo_top.addItems(self.data.columns[1:])
-        self.combo_bottom.addItems(self.data.columns[1:])
+        self.combo_top.addItems(self.replay.names[1:])
+        self.combo_bottom.addItems(self.replay.names[1:])
 
         self.combo_top.currentTextChanged.connect(self.changeTopVariable)
         self.combo_bottom.currentTextChanged.connect(self.changeBottomVariable)
@@ -117,20 +120,28 @@ class PLOTSGroundStation(QMainWindow):
         main_layout.addLayout(left_layout, 2)
         main_layout.addLayout(right_layout, 3)
 
-        central = QWidget()
-        central.setLayout(main_layout)
-        self.setCentralWidget(central)
-
         self.timer = QTimer()
         self.timer.timeout.connect(self.readNextPacket)
         self.timer.start(INTERVAL_MS)
 
+        # Seeks rebuild every plot from the column views in one step
+        self.timeline = ReplayTimeline(self.replay, self.timer)
+        self.timeline.seeked.connect(self.showHistory)
+
+        outer_layout = QVBoxLayout()
+        outer_layout.addLayout(main_layout, 1)
+        outer_layout.addWidget(self.timeline)
+
+        central = QWidget()
+        central.setLayout(outer_layout)
+        self.setCentralWidget(central)
+
     def changeTopVariable(self, var):
         self.var_top = var
         unit = UNITS.get(var, "")
 
-        self.plot2D_top.times = self.data["T"].values[:self.index].tolist()
-        self.plot2D_top.values = self.data[var].values[:self.index].tolist()
+        self.plot2D_top.times = self.replay.history("T")
+        self.plot2D_top.values = self.replay.history(var)
 
         self.plot2D_top.ax.set_ylabel(f"{var} ({unit})")
         self.plot2D_top.ax.set_title(f"{var} vs Time")
@@ -140,35 +151,40 @@ class PLOTSGroundStation(QMainWindow):
         self.var_bottom = var
         unit = UNITS.get(var, "")
 
-        self.plot2D_bottom.times = self.data["T"].values[:self.index].tolist()
-        self.plot2D_bottom.values = self.data[var].values[:self.index].tolist()
+        self.plot2D_bottom.times = self.replay.history("T")
+        self.plot2D_bottom.values = self.replay.history(var)
 
         self.plot2D_bottom.ax.set_ylabel(f"{var} ({unit})")
         self.plot2D_bottom.ax.set_title(f"{var} vs Time")
         self.plot2D_bottom.updatePlot()
 
-    def readNextPacket(self):
-        if self.index >= len(self.data):
-            self.timer.stop()
-            return
-
-        row = self.data.iloc[self.index]
-        t = row["T"]
+    def showHistory(self):
+        t = self.replay.history("T")
 
-        self.plot2D_top.times.append(t)
-        self.plot2D_top.values.append(row[self.var_top])
+        self.plot2D_top.times = t
+        self.plot2D_top.values = self.replay.history(self.var_top)
         self.plot2D_top.updatePlot()
 
-        self.plot2D_bottom.times.append(t)
-        self.plot2D_bottom.values.append(row[self.var_bottom])
+        self.plot2D_bottom.times = t
+        self.plot2D_bottom.values = self.replay.history(self.var_bottom)
         self.plot2D_bottom.updatePlot()
 
-        self.plot3D.times.append(t)
-        self.plot3D.altitudes.append(row["Alt"])
-        self.plot3D.velocities.append(row["Veloc"])
+        self.plot3D.times = t
+        self.plot3D.altitudes = self.replay.history("Alt")
+        self.plot3D.velocities = self.replay.history("Veloc")
         self.plot3D.updatePlot()
 
-        self.index = self.index + 1
+    def readNextPacket(self):
+        if self.replay.finished:
+            self.timer.stop()
+            self.timeline.sync()
+            return
+
+        # Every row that fell due since the last tick, on the log's own T column
+        rows = self.replay.tick()
+        if rows.start != rows.stop:
+            self.showHistory()
+        self.timeline.sync()
 
 
 if __name__ == "__main__":
@@ -6,12 +6,15 @@
 # -----------------------------------------------------------------------------------------------------------------------------
 # Code
 import sys
-import pandas as pd
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QComboBox, QLabel)
 from PyQt5.QtCore import QTimer
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 
+from flight_log import flight_log_path
+from flight_replay import FlightReplay
+from replay_timeline import ReplayTimeline
+
 FLIGHT_DATA_PATH = "/home/admin/PLOTS-DEV/dtl3.csv"
 INTERVAL_MS = 30
 
@@ -42,11 +45,11 @@ class PLOTSGroundStation(QMainWindow):
         self.setWindowTitle("LASER Mission Control - PLOTS Ground Station")
         self.resize(800, 600)
 
-        self.data = pd.read_csv(FLIGHT_DATA_PATH)
-        self.index = 0
+        # Converted once to NumPy columns; ticks only slice them
+        self.replay = FlightReplay.from_file(flight_log_path(FLIGHT_DATA_PATH))
         self.canvas = PlotLiveCanvas()
         self.variable_select = QComboBox(self)
-        self.variable_select.addItems(self.data.columns[1:])
+        self.variable_select.addItems(self.replay.names[1:])
         self.variable_select.currentTextChanged.connect(self.changePlotVariable)
 
         central = QWidget()
@@ -61,33 +64,39 @@ class PLOTSGroundStation(QMainWindow):
         self.timer.timeout.connect(self.readNextPacket)
         self.timer.start(INTERVAL_MS)
 
+        # Seeks rebuild every plot from the column views in one step
+        self.timeline = ReplayTimeline(self.replay, self.timer)
+        self.timeline.seeked.connect(self.showHistory)
+        layout.addWidget(self.timeline)
+
         self.selected_variable = self.variable_select.currentText()
         self.initializeData()
 
     def initializeData(self):
-        self.canvas.times = self.data["T"].values.tolist()[:10]
-        self.canvas.data_values = self.data[self.selected_variable].values.tolist()[:10]
-        self.canvas.updatePlot()
+        self.replay.seek(10)
+        self.showHistory()
 
     def changePlotVariable(self, variable):
         self.selected_variable = variable
         self.canvas.ax.set_ylabel(variable)
 
         self.canvas.ax.set_title(f"{variable} vs Time")
-        if self.index < len(self.data):
-            self.canvas.data_values = self.data[self.selected_variable].values.tolist()[:self.index + 10]
-            self.canvas.updatePlot()
+        self.showHistory()
+
+    def showHistory(self):
+        self.canvas.times = self.replay.history("T")
+        self.canvas.data_values = self.replay.history(self.selected_variable)
+        self.canvas.updatePlot()
 
     def readNextPacket(self):
-        if self.index < len(self.data):
-            time = self.data.iloc[self.index]["T"]
-            data_value = self.data.iloc[self.index][self.selected_variable]
-            self.canvas.times.append(time)  
-            self.canvas.data_values.append(data_value)
-            self.canvas.updatePlot()
-            self.index = self.index + 1
-        else:
+        if self.replay.finished:
             self.timer.stop()
+            self.timeline.sync()
+            return
+        rows = self.replay.tick()
+        if rows.start != rows.stop:
+            self.showHistory()
+        self.timeline.sync()
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
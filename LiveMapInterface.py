@@ -1,141 +1,54 @@
-import sys, os, math, requests, csv
-from http.server import HTTPServer, BaseHTTPRequestHandler
-from threading import Thread
-from PyQt5.QtWidgets import QApplication, QMainWindow
+import sys, os
+from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QWidget
 from PyQt5.QtWebEngineWidgets import QWebEngineView
 from PyQt5.QtCore import QUrl, QTimer
 
+from flight_log import load_flight_log
+from flight_replay import FlightReplay
+from replay_timeline import ReplayTimeline
+from tile_archive import open_tile_store
+from tile_corridor import corridor_tiles, read_track
+from tile_downloader import TileDownloader
+from tile_manifest import TileManifest
+from tile_prefetch import TilePrefetcher
+from tile_scheme import MetricsOverlay, install_tile_scheme, register_tile_scheme
+from tile_server import TileCache, TileDirectory
+
 TILE_DIR = "tiles"  # must contain zoom 12–18
 
 # ... all your tile helpers and TileServer unchanged ...
 # ---------------- TILE DOWNLOAD HELPERS ----------------
 
-LAT_MIN, LAT_MAX = 53.38, 53.45
-LON_MIN, LON_MAX = -3.05, -2.90
-
-OSM_URL = "https://tile.openstreetmap.org/{z}/{x}/{y}.png"
-HEADERS = {"User-Agent": "LiverpoolOfflineMap/1.0 (Educational)"}
-
-def latlon_to_tile(lat, lon, zoom):
-    lat_rad = math.radians(lat)
-    n = 2.0 ** zoom
-    xtile = int((lon + 180.0) / 360.0 * n)
-    ytile = int((1.0 - math.log(math.tan(lat_rad) + 1 / math.cos(lat_rad)) / math.pi) / 2.0 * n)
-    return xtile, ytile
-
-def download_tile(z, x, y):
-    url = OSM_URL.format(z=z, x=x, y=y)
-    save_path = f"{TILE_DIR}/{z}/{x}"
-    os.makedirs(save_path, exist_ok=True)
-    tile_file = f"{save_path}/{y}.png"
+# Only tiles near the launch site and the flight path are downloaded
+LAUNCH_SITE = (53.4066, -2.9665)
+MAX_RANGE_M = 1000
+TRACK_FILE = "telemetry.csv"
 
-    if os.path.exists(tile_file):
-        return True
-
-    try:
-        r = requests.get(url, headers=HEADERS, timeout=10)
-        if r.status_code == 200:
-            with open(tile_file, "wb") as f:
-                f.write(r.content)
-            return True
-        else:
-            print(f"Failed {url}: HTTP {r.status_code}")
-            return False
-    except Exception as e:
-        print(f"Error downloading {url}: {e}")
-        return False
-
-def ensure_tiles():
+def ensure_tiles(manifest):
     print("Checking for missing tiles...")
-    required_zooms = range(12, 19)
-
-    for z in required_zooms:
-        x_min, y_max = latlon_to_tile(LAT_MIN, LON_MIN, z)
-        x_max, y_min = latlon_to_tile(LAT_MAX, LON_MAX, z)
-
-        x1, x2 = sorted([x_min, x_max])
-        y1, y2 = sorted([y_min, y_max])
-
-        total = (x2 - x1 + 1) * (y2 - y1 + 1)
-        count = 0
-
-        print(f"Zoom {z}: downloading {total} tiles if missing...")
-
-        for x in range(x1, x2 + 1):
-            for y in range(y1, y2 + 1):
-                download_tile(z, x, y)
-                count += 1
-                if count % 50 == 0:
-                    print(f"  {count}/{total} tiles processed...")
-
+    tracks = [read_track(TRACK_FILE)] if os.path.exists(TRACK_FILE) else []
+    tiles = corridor_tiles(range(12, 19), LAUNCH_SITE, MAX_RANGE_M, tracks)
+    print(f"Zoom 12-18: downloading {len(tiles)} tiles around the launch site and flight path if missing...")
+    ok, failed = TileDownloader(TileDirectory(TILE_DIR), manifest=manifest).download(tiles)
+    manifest.report()
+    if failed:
+        print(f"{failed} tiles failed to download.")
     print("Tile download complete. Offline map ready.")
 
 def verify_tiles():
-    required_zooms = ["12", "13", "14", "15", "16", "17", "18"]
-
-    if not os.path.isdir(TILE_DIR):
-        print("Tile directory missing. Creating and downloading tiles...")
-        os.makedirs(TILE_DIR, exist_ok=True)
-        ensure_tiles()
+    # One small manifest read instead of walking every zoom folder
+    manifest = TileManifest(TILE_DIR)
+    if manifest.load() and manifest.is_complete():
+        print("All required tiles already present.")
         return True
 
-    missing = False
-
-    for z in required_zooms:
-        zpath = os.path.join(TILE_DIR, z)
-        if not os.path.isdir(zpath):
-            print(f"Missing zoom folder {z}, downloading tiles...")
-            missing = True
-            continue
-
-        has_tiles = any(
-            fname.endswith(".png")
-            for root, dirs, files in os.walk(zpath)
-            for fname in files
-        )
-        if not has_tiles:
-            print(f"Zoom {z} folder empty, downloading tiles...")
-            missing = True
-
-    if missing:
-        ensure_tiles()
+    if manifest.exists():
+        print("Tile manifest incomplete, downloading missing tiles...")
     else:
-        print("All required tiles already present.")
-
+        print("No tile manifest yet, checking tiles and downloading missing ones...")
+    ensure_tiles(manifest)
     return True
 
-# ---------------- LOCAL TILE SERVER ----------------
-
-class TileServer(BaseHTTPRequestHandler):
-    def log_message(self, *args):
-        return
-
-    def do_GET(self):
-        parts = self.path.strip("/").split("/")
-        if len(parts) != 3:
-            self.send_error(404)
-            return
-
-        z, x, y_png = parts
-        y = y_png.replace(".png", "")
-        tile_path = f"{TILE_DIR}/{z}/{x}/{y}.png"
-
-        if not os.path.exists(tile_path):
-            self.send_error(404)
-            return
-
-        with open(tile_path, "rb") as f:
-            data = f.read()
-
-        self.send_response(200)
-        self.send_header("Content-type", "image/png")
-        self.end_headers()
-        self.wfile.write(data)
-
-def start_server():
-    HTTPServer(("localhost", 5000), TileServer).serve_forever()
-
-
 # ---------------- HTML MAP ----------------
 HTML = """
 <!DOCTYPE html>
@@ -156,7 +69,7 @@ HTML = """
         maxZoom: 18
     }).setView([53.4066, -2.9665], 15);
 
-    L.tileLayer('http://localhost:5000/{z}/{x}/{y}.png', {
+    L.tileLayer('tiles://local/{z}/{x}/{y}.png', {
         minZoom: 12,
         maxZoom: 18,
         noWrap: true,
@@ -196,55 +109,78 @@ HTML = """
 # ---------------- MAIN APP ----------------
 
 class MapWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, store):
         super().__init__()
         self.setWindowTitle("Liverpool Offline Map")
 
         self.view = QWebEngineView()
         self.view.setHtml(HTML, QUrl("file:///"))
-        self.setCentralWidget(self.view)
 
         # --- telemetry state ---
         self.telemetry = self.load_telemetry("telemetry.csv")
-        self.telemetry_index = 0
 
         self.timer = QTimer(self)
         self.timer.setInterval(30)  # ~0.03 s
         self.timer.timeout.connect(self.step_telemetry)
-        self.timer.start()
+
+        central = QWidget()
+        layout = QVBoxLayout(central)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.view, 1)
+        if self.telemetry is not None:
+            self.timer.start()
+            self.timeline = ReplayTimeline(self.telemetry, self.timer)
+            self.timeline.seeked.connect(self.show_position)
+            layout.addWidget(self.timeline)
+        self.setCentralWidget(central)
+
+        # --- tile prefetch ahead of the track ---
+        self.prefetcher = TilePrefetcher(store)
+        self.zoom_timer = QTimer(self)
+        self.zoom_timer.setInterval(1000)
+        self.zoom_timer.timeout.connect(
+            lambda: self.view.page().runJavaScript("map.getZoom();", self.prefetcher.set_zoom))
+        self.zoom_timer.start()
 
     def load_telemetry(self, path):
-        data = []
         if not os.path.exists(path):
             print(f"Telemetry file {path} not found")
-            return data
-        with open(path, newline="") as f:
-            r = csv.DictReader(f)
-            for row in r:
-                try:
-                    lat = float(row["lat"])
-                    lon = float(row["lon"])
-                    data.append((lat, lon))
-                except Exception:
-                    continue
-        print(f"Loaded {len(data)} telemetry points")
-        return data
+            return None
+        replay = FlightReplay(load_flight_log(path), time_column="t")
+        print(f"Loaded {len(replay)} telemetry points")
+        return replay
 
     def step_telemetry(self):
-        if not self.telemetry:
+        if self.telemetry.finished:
+            self.timer.stop()  # the timeline's Play button restarts from the top
+            self.timeline.sync()
             return
-        lat, lon = self.telemetry[self.telemetry_index]
-        js = f"updateMarker({lat}, {lon});"
-        self.view.page().runJavaScript(js)
-
-        self.telemetry_index += 1
-        if self.telemetry_index >= len(self.telemetry):
-            self.telemetry_index = 0  # loop, or call self.timer.stop()
+        rows = self.telemetry.tick()
+        if rows.start != rows.stop:
+            lat, lon = self.telemetry.current("lat"), self.telemetry.current("lon")
+            self.view.page().runJavaScript(f"updateMarker({lat}, {lon});")
+            self.prefetcher.feed(self.telemetry.current("t"), lat, lon)
+        self.timeline.sync()
+
+    def show_position(self):
+        # After a seek the marker jumps straight to the row; no rows are replayed
+        if self.telemetry.index == 0:
+            return
+        lat, lon = self.telemetry.current("lat"), self.telemetry.current("lon")
+        self.view.page().runJavaScript(f"updateMarker({lat}, {lon});")
+        # Zero speed so the jump is not taken as velocity for the look-ahead
+        self.prefetcher.feed(self.telemetry.current("t"), lat, lon, speed=0, heading=0)
 
 if __name__ == "__main__":
     verify_tiles()
-    Thread(target=start_server, daemon=True).start()
+    # One cache for the tiles:// handler and the prefetcher, so warmed tiles are
+    # already loaded when the page asks for them
+    store = TileCache(open_tile_store(TILE_DIR))
+    register_tile_scheme()
     app = QApplication(sys.argv)
-    w = MapWindow()
+    tiles = install_tile_scheme(store)
+    w = MapWindow(store)
+    if "--metrics" in sys.argv:
+        MetricsOverlay(w.view, store)
     w.show()
     sys.exit(app.exec_())
@@ -1,61 +1,17 @@
 import sys
-import os
-from http.server import HTTPServer, BaseHTTPRequestHandler
-from threading import Thread
 from PyQt5.QtWidgets import QApplication, QMainWindow
 from PyQt5.QtWebEngineWidgets import QWebEngineView
 
+from tile_archive import open_tile_store
+from tile_scheme import MetricsOverlay, install_tile_scheme, register_tile_scheme
+from tile_server import TileCache
+
 # Directory where your tiles are stored
 TILE_SAVE_PATH = "tiles"  # Folder containing the downloaded tiles
-HOST = "localhost"
-PORT = 5000
-
-# HTTP Server to serve local tiles
-class TileHandler(BaseHTTPRequestHandler):
-    # This silences the console output for every GET request and error
-    def log_message(self, format, *args):
-        return
-
-    def do_GET(self):
-        # Parse the path for zoom level, x, and y from the URL
-        path = self.path.strip("/").split("/")
-        if len(path) != 3:
-            self.send_error(404)
-            return
-
-        try:
-            z_req, x_req, y_png = path
-            z_req = int(z_req)
-            x_req = int(x_req)
-            y_req = int(y_png.split(".")[0])  # Strip the ".png" from the filename
-        except Exception:
-            self.send_error(400)
-            return
-
-        # Build the filename of the requested tile
-        tile_filename = f"{z_req}_{x_req}_{y_req}.png"
-        tile_path = os.path.join(TILE_SAVE_PATH, tile_filename)
-
-        if os.path.exists(tile_path):
-            # Tile exists, serve it
-            with open(tile_path, 'rb') as f:
-                self.send_response(200)
-                self.send_header("Content-type", "image/png")
-                self.end_headers()
-                self.wfile.write(f.read())
-        else:
-            # Tile not found, return 404
-            self.send_response(404)
-            self.end_headers()
-
-def run_server():
-    httpd = HTTPServer((HOST, PORT), TileHandler)
-    print(f"Serving tiles at http://{HOST}:{PORT}")
-    httpd.serve_forever()
 
-# Run server in a separate thread
-server_thread = Thread(target=run_server, daemon=True)
-server_thread.start()
+# Serve local tiles in-process through the tiles:// scheme
+store = TileCache(open_tile_store(TILE_SAVE_PATH, layout="flat"))
+register_tile_scheme()
 
 # --- PyQt5 Integration ---
 
@@ -101,7 +57,7 @@ function renderTiles() {
             const img = new Image();
             // Suppress the console error if the image fails to load
             img.onerror = () => { img.style.display = 'none'; };
-            img.src = `http://localhost:5000/${zoom}/${x}/${y}.png`;
+            img.src = `tiles://local/${zoom}/${x}/${y}.png`;
             img.style.position = "absolute";
             
             // Positioning relative to center
@@ -153,6 +109,9 @@ class RocketMap(QMainWindow):
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
+    tiles = install_tile_scheme(store)
     window = RocketMap()
+    if "--metrics" in sys.argv:
+        MetricsOverlay(window.browser, store)
     window.show()
     sys.exit(app.exec_())
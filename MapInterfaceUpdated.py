@@ -1,10 +1,13 @@
 import sys, os
-from http.server import HTTPServer, BaseHTTPRequestHandler
-from threading import Thread
 from PyQt5.QtWidgets import QApplication, QMainWindow
 from PyQt5.QtWebEngineWidgets import QWebEngineView
 from PyQt5.QtCore import QUrl
 
+from tile_archive import open_tile_store
+from tile_manifest import TileManifest
+from tile_scheme import MetricsOverlay, install_tile_scheme, register_tile_scheme
+from tile_server import TileCache
+
 TILE_DIR = "tiles"  # must contain zoom 12–18
 
 # ---------------- TILE VERIFICATION ----------------
@@ -16,6 +19,16 @@ def verify_tiles():
         print(f"ERROR: Missing tile directory: {TILE_DIR}")
         return False
 
+    # Trees written by the downloader carry a manifest; older ones fall back to a walk
+    manifest = TileManifest(TILE_DIR)
+    if manifest.load():
+        if not manifest.is_complete():
+            print("ERROR: Tile manifest lists missing tiles:")
+            manifest.report()
+            return False
+        print("All required tiles (zoom 12–18) are present.")
+        return True
+
     for z in required_zooms:
         zpath = os.path.join(TILE_DIR, z)
         if not os.path.isdir(zpath):
@@ -35,37 +48,6 @@ def verify_tiles():
     print("All required tiles (zoom 12–18) are present.")
     return True
 
-# ---------------- LOCAL TILE SERVER ----------------
-
-class TileServer(BaseHTTPRequestHandler):
-    def log_message(self, *args):
-        return
-
-    def do_GET(self):
-        parts = self.path.strip("/").split("/")
-        if len(parts) != 3:
-            self.send_error(404)
-            return
-
-        z, x, y_png = parts
-        y = y_png.replace(".png", "")
-        tile_path = f"{TILE_DIR}/{z}/{x}/{y}.png"
-
-        if not os.path.exists(tile_path):
-            self.send_error(404)
-            return
-
-        with open(tile_path, "rb") as f:
-            data = f.read()
-
-        self.send_response(200)
-        self.send_header("Content-type", "image/png")
-        self.end_headers()
-        self.wfile.write(data)
-
-def start_server():
-    HTTPServer(("localhost", 5000), TileServer).serve_forever()
-
 # ---------------- HTML MAP ----------------
 
 HTML = """
@@ -87,7 +69,7 @@ HTML = """
         maxZoom: 18
     }).setView([53.4066, -2.9665], 15);
 
-    L.tileLayer('http://localhost:5000/{z}/{x}/{y}.png', {
+    L.tileLayer('tiles://local/{z}/{x}/{y}.png', {
         minZoom: 12,
         maxZoom: 18,
         noWrap: true,
@@ -132,9 +114,13 @@ if __name__ == "__main__":
         print("Tile directory incomplete. Please download all required tiles (zoom 12–18).")
         sys.exit(1)
 
-    Thread(target=start_server, daemon=True).start()
+    register_tile_scheme()
     app = QApplication(sys.argv)
+    store = TileCache(open_tile_store(TILE_DIR))
+    tiles = install_tile_scheme(store)
     w = MapWindow()
+    if "--metrics" in sys.argv:
+        MetricsOverlay(w.centralWidget(), store)
     w.show()
     sys.exit(app.exec_())
 
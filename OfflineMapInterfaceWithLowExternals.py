@@ -1,92 +1,14 @@
 import sys
-import sqlite3
-import io
 import os
-from http.server import HTTPServer, BaseHTTPRequestHandler
-from threading import Thread
-from PIL import Image
 
 from PyQt5.QtWidgets import QApplication, QMainWindow
 from PyQt5.QtWebEngineWidgets import QWebEngineView
 from PyQt5.QtCore import QUrl
 
-MBTILES_FILE = "liverpool.mbtiles"
-HOST = "localhost"
-PORT = 5000
-
-# ---------- HTTP Server ----------
-class MBTilesHandler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        path = self.path.strip("/").split("/")
-        if len(path) != 3:
-            self.send_error(404)
-            return
-        try:
-            z_req, x_req, y_png = path
-            z_req = int(z_req)
-            x_req = int(x_req)
-            y_req = int(y_png.split(".")[0])
-            y_tms_req = (1 << z_req) - 1 - y_req
-        except:
-            self.send_error(400)
-            return
-
-        conn = sqlite3.connect(MBTILES_FILE)
-        cur = conn.cursor()
-
-        cur.execute(
-            "SELECT tile_data FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?",
-            (z_req, x_req, y_tms_req)
-        )
-        row = cur.fetchone()
-
-        if row is None:
-            cur.execute("SELECT MIN(zoom_level), MAX(zoom_level) FROM tiles")
-            z_min, z_max = cur.fetchone()
-
-            if z_req < z_min:
-                z_src = z_min
-            elif z_req > z_max:
-                z_src = z_max
-            else:
-                z_src = z_req
-
-            scale = 2 ** (z_src - z_req)
-            x_src = x_req // scale
-            y_src = ((1 << z_src) - 1 - ((1 << z_req) - 1 - y_req) // scale)
-
-            cur.execute(
-                "SELECT tile_data FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?",
-                (z_src, x_src, y_src)
-            )
-            row = cur.fetchone()
-
-            if row is None:
-                conn.close()
-                self.send_error(404)
-                return
-
-            tile = Image.open(io.BytesIO(row[0])).resize((256, 256), Image.Resampling.LANCZOS)
-            buf = io.BytesIO()
-            tile.save(buf, format="PNG")
-            tile_data = buf.getvalue()
-        else:
-            tile_data = row[0]
-
-        conn.close()
-
-        self.send_response(200)
-        self.send_header("Content-type", "image/png")
-        self.end_headers()
-        self.wfile.write(tile_data)
-
-def run_server():
-    httpd = HTTPServer((HOST, PORT), MBTilesHandler)
-    print(f"Serving MBTiles at http://{HOST}:{PORT}/{{z}}/{{x}}/{{y}}.png")
-    httpd.serve_forever()
-
-server_thread = Thread(target=run_server, daemon=True)
-server_thread.start()
+from tile_scheme import MetricsOverlay, install_tile_scheme, register_tile_scheme
+from tile_server import MBTilesStore, TileCache
+
+MBTILES_FILE = "liverpool.mbtiles"  # build with: python tile_mbtiles.py import tiles
 
 # ---------- HTML ----------
 HTML_TEMPLATE = """
@@ -138,7 +60,7 @@ function render() {
             const y = startY + dy;
 
             const img = document.createElement("img");
-            img.src = `http://localhost:5000/${zoom}/${x}/${y}.png`;
+            img.src = `tiles://local/${zoom}/${x}/${y}.png`;
             img.style.position = "absolute";
             img.style.left = (dx * tileSize) + "px";
             img.style.top = (dy * tileSize) + "px";
@@ -263,7 +185,18 @@ class RocketMap(QMainWindow):
 
 
 if __name__ == "__main__":
+    if not os.path.exists(MBTILES_FILE):
+        print(f"ERROR: Missing {MBTILES_FILE}. Build it with one of:")
+        print("  python tile_mbtiles.py import tiles")
+        print("  python tile_mbtiles.py download")
+        sys.exit(1)
+
+    store = TileCache(MBTilesStore(MBTILES_FILE))
+    register_tile_scheme()
     app = QApplication(sys.argv)
+    tiles = install_tile_scheme(store)
     window = RocketMap()
+    if "--metrics" in sys.argv:
+        MetricsOverlay(window.browser, store)
     window.show()
     sys.exit(app.exec_())
@@ -6,21 +6,26 @@
 # -----------------------------------------------------------------------------------------------------------------------------
 # Code:
 import sys
+import json
 import time
+import argparse
 import serial
 from collections import deque
-from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget,QVBoxLayout, QHBoxLayout, QLabel, QComboBox)
+from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget,QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QShortcut)
 from PyQt5.QtCore import QTimer, Qt
-from PyQt5.QtGui import QPixmap, QFont, QFontDatabase
+from PyQt5.QtGui import QPixmap, QFont, QFontDatabase, QKeySequence
 from PyQt5.QtWebEngineWidgets import QWebEngineView
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 
+from flight_replay import REPLAY_SPEEDS
+from telemetry_source import SERIAL_PORT, ReplaySource, open_source
+
 
-SERIAL_PORT = "/dev/ttyAMA0"
-BAUD_RATE = 115200
 INTERVAL_MS = 30
 UART_TIMEOUT_SEC = 1.0
+MAP_FRAME_MS = 33
+TRACK_MAX_POINTS = 5000
 
 UNITS = {
     "T": "s",
@@ -127,8 +132,8 @@ html, body, #map {
 
 <script>
 var map;
-var path;
-var marker;
+var tracks = {};
+var followId = null;
 
 function initMap() {
     map = L.map('map').setView([0, 0], 2);
@@ -136,23 +141,35 @@ function initMap() {
     L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
         maxZoom: 18
     }).addTo(map);
+}
 
-    path = L.polyline([], {color: 'red', weight: 3}).addTo(map);
-
-    marker = L.circleMarker([0, 0], {
-        radius: 6,
-        color: 'lime',
-        fillColor: 'lime',
+function addTrack(id, style) {
+    if (tracks[id]) return;
+    var path = L.polyline([], {color: style.color, weight: style.weight}).addTo(map);
+    var marker = L.circleMarker([0, 0], {
+        radius: style.radius,
+        color: style.marker,
+        fillColor: style.marker,
         fillOpacity: 1
     }).addTo(map);
+    tracks[id] = {path: path, marker: marker, maxPoints: style.maxPoints};
+    if (style.follow) followId = id;
 }
 
-function updatePosition(lat, lon) {
-    if (!map || !marker || !path) return;
-    var p = [lat, lon];
-    marker.setLatLng(p);
-    path.addLatLng(p);
-    map.setView(p, map.getZoom(), {animate: false});
+function applyFrame(frame) {
+    if (!map) return;
+    for (var id in frame.styles) addTrack(id, frame.styles[id]);
+    for (var id in frame.points) {
+        var t = tracks[id];
+        var pts = frame.points[id];
+        if (!t || pts.length === 0) continue;
+        var latlngs = t.path.getLatLngs();
+        for (var i = 0; i < pts.length; i++) latlngs.push(L.latLng(pts[i][0], pts[i][1]));
+        if (latlngs.length > t.maxPoints) latlngs.splice(0, latlngs.length - t.maxPoints);
+        t.path.setLatLngs(latlngs);
+        t.marker.setLatLng(pts[pts.length - 1]);
+        if (id === followId) map.setView(pts[pts.length - 1], map.getZoom(), {animate: false});
+    }
 }
 
 window.onload = initMap;
@@ -165,27 +182,59 @@ class LiveMap(QWebEngineView):
     def __init__(self):
         super().__init__()
         self.map_ready = False
-        self.pending_positions = deque()
+        self.tracks = {}
+        self.pending_styles = {}
+        self.add_track("vehicle", follow=True)
         self.loadFinished.connect(self._on_load_finished)
         self.setHtml(MAP_HTML)
 
+        self.frame_timer = QTimer(self)
+        self.frame_timer.timeout.connect(self.flush)
+        self.frame_timer.start(MAP_FRAME_MS)
+
     def _on_load_finished(self, ok):
         if ok:
             self.map_ready = True
-            while self.pending_positions:
-                lat, lon = self.pending_positions.popleft()
-                self.update_position(lat, lon)
-            self.update_position(0, 0)
+            self.flush()
 
-    def update_position(self, lat, lon):
+    def add_track(self, track_id, color="red", marker="lime", weight=3, radius=6,
+                  max_points=TRACK_MAX_POINTS, follow=False):
+        if track_id in self.tracks:
+            return
+        self.tracks[track_id] = deque(maxlen=max_points)
+        self.pending_styles[track_id] = {
+            "color": color,
+            "marker": marker,
+            "weight": weight,
+            "radius": radius,
+            "maxPoints": max_points,
+            "follow": follow
+        }
+
+    def update_position(self, lat, lon, track_id="vehicle"):
+        if track_id not in self.tracks:
+            self.add_track(track_id)
+        self.tracks[track_id].append((lat, lon))
+
+    def flush(self):
+        # One runJavaScript per frame regardless of how many tracks moved
         if not self.map_ready:
-            self.pending_positions.append((lat, lon))
             return
-        self.page().runJavaScript(f"updatePosition({lat}, {lon});")
+        points = {}
+        for track_id, pending in self.tracks.items():
+            if pending:
+                points[track_id] = list(pending)
+                pending.clear()
+        if not points and not self.pending_styles:
+            return
+        frame = {"styles": self.pending_styles, "points": points}
+        self.pending_styles = {}
+        self.page().runJavaScript(f"applyFrame({json.dumps(frame)});")
 
 class PLOTSGroundStation(QMainWindow):
-    def __init__(self):
+    def __init__(self, source):
         super().__init__()
+        self.source = source
         self.setWindowTitle("LASER – UnityRise Mission Control - PL-26")
         self.resize(1200, 700)
         font_id = QFontDatabase.addApplicationFont("/home/admin/pl26-groundstation/Assets/Orbitron-VariableFont_wght.ttf")
@@ -203,13 +252,6 @@ class PLOTSGroundStation(QMainWindow):
         self.title_banner.setFont(ui_font(18, QFont.Bold))
         self.title_banner.setStyleSheet("background-color:#212b58;color:white;letter-spacing:2px;")
 
-        try:
-            self.ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=0.05)
-            self.ser.reset_input_buffer()
-        except serial.SerialException:
-            sys.exit(1)
-
-        self.start_time = time.time()
         self.last_packet_time = 0
         self.packet_times = deque(maxlen=200)
 
@@ -329,6 +371,25 @@ class PLOTSGroundStation(QMainWindow):
         self.timer.timeout.connect(self.updateConnectionStatus)
         self.timer.start(INTERVAL_MS)
 
+        if isinstance(source, ReplaySource):
+            self.setWindowTitle(f"{self.windowTitle()} – Replay {source.name}")
+            # Space pauses, Right steps one packet, +/- change the replay speed
+            QShortcut(QKeySequence(Qt.Key_Space), self, self.togglePause)
+            QShortcut(QKeySequence(Qt.Key_Right), self, lambda: self.handleLines(source.step()))
+            QShortcut(QKeySequence(Qt.Key_Plus), self, lambda: self.changeSpeed(1))
+            QShortcut(QKeySequence(Qt.Key_Minus), self, lambda: self.changeSpeed(-1))
+
+    def togglePause(self):
+        if self.source.paused:
+            self.source.resume()
+        else:
+            self.source.pause()
+
+    def changeSpeed(self, step):
+        i = min(range(len(REPLAY_SPEEDS)), key=lambda i: abs(REPLAY_SPEEDS[i] - self.source.speed))
+        self.source.speed = REPLAY_SPEEDS[min(max(i + step, 0), len(REPLAY_SPEEDS) - 1)]
+        print(f"Replay speed {self.source.speed:g}x")
+
     def changeTopVariable(self, var):
         self.plot2D_top.resetPlot(f"{var} vs Time", f"{var} ({UNITS[var]})")
 
@@ -344,12 +405,11 @@ class PLOTSGroundStation(QMainWindow):
             self.armed_label.setStyleSheet("color:green;")
 
     def readNextPacket(self):
-        if self.ser.in_waiting == 0:
-            return
+        self.handleLines(self.source.read_lines())
 
+    def handleLines(self, lines):
         last_valid_line = None
-        while self.ser.in_waiting:
-            line = self.ser.readline().decode("ascii", errors="ignore").strip()
+        for line in lines:
             if "," in line:
                 last_valid_line = line
 
@@ -362,7 +422,7 @@ class PLOTSGroundStation(QMainWindow):
                 return
 
             packet = {
-                "T": time.time() - self.start_time,
+                "T": self.source.elapsed(),
                 "Alt": float(v[0]),
                 "Veloc": float(v[1]),
                 "Lat": float(v[2]),
@@ -410,7 +470,19 @@ class PLOTSGroundStation(QMainWindow):
         self.live_map.update_position(packet["Lat"], packet["Lon"])
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    window = PLOTSGroundStation()
+    parser = argparse.ArgumentParser(description="PL-26 live ground station")
+    parser.add_argument("--replay", metavar="LOG", help="play a recorded flight log instead of reading the radio")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed (2 = twice real time)")
+    parser.add_argument("--port", default=SERIAL_PORT)
+    args, qt_args = parser.parse_known_args()
+
+    try:
+        source = open_source(args.replay, args.speed, args.port)
+    except serial.SerialException as e:
+        print(f"Radio not connected ({e}); use --replay LOG to play a recorded flight")
+        sys.exit(1)
+
+    app = QApplication(sys.argv[:1] + qt_args)
+    window = PLOTSGroundStation(source)
     window.show()
     sys.exit(app.exec_())
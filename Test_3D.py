@@ -6,12 +6,15 @@
 # -----------------------------------------------------------------------------------------------------------------------------
 # Code
 import sys
-import pandas as pd
 import numpy as np
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QComboBox, QLabel)
 from PyQt5.QtCore import QTimer
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
+
+from flight_log import flight_log_path
+from flight_replay import FlightReplay
+from replay_timeline import ReplayTimeline
 from mpl_toolkits.mplot3d import Axes3D
 
 FLIGHT_DATA_PATH = "/home/admin/PLOTS-DEV/dtl3.csv"
@@ -47,12 +50,12 @@ class PLOTSGroundStation(QMainWindow):
         self.setWindowTitle("PLOTS Ground Station")
         self.resize(800, 600)
 
-        self.data = pd.read_csv(FLIGHT_DATA_PATH)
-        self.index = 0
+        # Converted once to NumPy columns; ticks only slice them
+        self.replay = FlightReplay.from_file(flight_log_path(FLIGHT_DATA_PATH))
         self.canvas = PlotLive3D()
         self.variable_select = QComboBox(self)
 
-        self.variable_select.addItems(self.data.columns[1:])  
+        self.variable_select.addItems(self.replay.names[1:])  
         self.variable_select.setEnabled(False)
 
         central = QWidget()
@@ -65,20 +68,26 @@ class PLOTSGroundStation(QMainWindow):
         self.timer.timeout.connect(self.readNextPacket)
         self.timer.start(INTERVAL_MS)
 
-    def readNextPacket(self):
-        if self.index < len(self.data):
-            time = self.data.iloc[self.index]["T"]
-            altitude = self.data.iloc[self.index]["Alt"]
-            velocity = self.data.iloc[self.index]["Veloc"]
-            self.canvas.times.append(time)
-            self.canvas.altitudes.append(altitude)
-            self.canvas.velocities.append(velocity)
+        # Seeks rebuild every plot from the column views in one step
+        self.timeline = ReplayTimeline(self.replay, self.timer)
+        self.timeline.seeked.connect(self.showHistory)
+        layout.addWidget(self.timeline)
 
+    def showHistory(self):
+        self.canvas.times = self.replay.history("T")
+        self.canvas.altitudes = self.replay.history("Alt")
+        self.canvas.velocities = self.replay.history("Veloc")
+        self.canvas.updatePlot()
 
-            self.canvas.updatePlot()
-            self.index = self.index + 1
-        else:
+    def readNextPacket(self):
+        if self.replay.finished:
             self.timer.stop()
+            self.timeline.sync()
+            return
+        rows = self.replay.tick()
+        if rows.start != rows.stop:
+            self.showHistory()
+        self.timeline.sync()
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
@@ -0,0 +1,61 @@
+import numpy as np
+
+from flight_log import load_flight_log
+
+# Attitude playback for the rocket model. The whole quaternion log is
+# normalized at once and turned into one float32 array of 4x4 model matrices
+# (scale, then rotation, row-major as QMatrix4x4 takes them), so a frame is a
+# row lookup: no per-tick QQuaternion maths, and any row can be shown at once.
+
+ROCKET_SCALE = 0.01
+ROW_PERIOD_S = 0.1  # telemetry_data.csv is logged at 10 Hz
+
+
+def normalized_quaternions(quats):
+    # (n, 4) w, x, y, z; zero-length rows become the identity
+    quats = np.asarray(quats, dtype=np.float64)
+    norms = np.linalg.norm(quats, axis=1, keepdims=True)
+    out = np.divide(quats, norms, out=np.zeros_like(quats), where=norms > 0)
+    out[norms[:, 0] == 0] = (1.0, 0.0, 0.0, 0.0)
+    return out
+
+
+def model_matrices(quats, scale=ROCKET_SCALE):
+    # Same matrices as QMatrix4x4().scale(s) followed by .rotate(QQuaternion(...).normalized())
+    w, x, y, z = normalized_quaternions(quats).T
+    m = np.zeros((len(w), 4, 4), dtype=np.float32)
+    m[:, 0, 0] = 1 - 2 * (y * y + z * z)
+    m[:, 0, 1] = 2 * (x * y - w * z)
+    m[:, 0, 2] = 2 * (x * z + w * y)
+    m[:, 1, 0] = 2 * (x * y + w * z)
+    m[:, 1, 1] = 1 - 2 * (x * x + z * z)
+    m[:, 1, 2] = 2 * (y * z - w * x)
+    m[:, 2, 0] = 2 * (x * z - w * y)
+    m[:, 2, 1] = 2 * (y * z + w * x)
+    m[:, 2, 2] = 1 - 2 * (x * x + y * y)
+    m[:, :3, :3] *= scale
+    m[:, 3, 3] = 1
+    return m
+
+
+class AttitudeTrack:
+    def __init__(self, quats, row_period=ROW_PERIOD_S, scale=ROCKET_SCALE):
+        self.quats = np.asarray(quats, dtype=np.float64)  # as logged, for the overlay text
+        self.matrices = model_matrices(self.quats, scale)
+        self.row_period = row_period
+
+    @classmethod
+    def from_file(cls, path, row_period=ROW_PERIOD_S, scale=ROCKET_SCALE):
+        columns = load_flight_log(path)
+        return cls(np.column_stack([columns[c] for c in ("w", "x", "y", "z")]), row_period, scale)
+
+    def __len__(self):
+        return len(self.matrices)
+
+    def frame_at(self, elapsed):
+        # Row shown `elapsed` seconds into playback, looping at the end
+        return int(elapsed / self.row_period) % len(self.matrices)
+
+    def matrix(self, frame):
+        # The 16 row-major values for QMatrix4x4(*values)
+        return self.matrices[frame].ravel().tolist()
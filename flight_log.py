@@ -0,0 +1,151 @@
+import glob
+import hashlib
+import io
+import os
+import sys
+
+import numpy as np
+
+# Loads Eggtimer CSV logs without pandas. The file's line endings (CR, LF or
+# CRLF), delimiter and header are sniffed, the numbers are parsed by numpy's C
+# reader in one pass, and the result is cached as a column-major .npy array in
+# the user's cache directory (never next to the log). Cache entries are named
+# after the log's path, size and mtime, so reopening an unchanged log is a
+# stat(), a read of its header line and an mmap; every column is a contiguous
+# view. The content is only hashed when size or mtime changed, to reuse the
+# entry of a log that was merely touched or copied back.
+
+FLIGHT_COLUMNS = ("T", "Alt", "Veloc", "FAlt", "FVeloc", "LDA", "LowV", "Apogee", "N-O", "Drogue", "Main")
+GPS_COLUMNS = FLIGHT_COLUMNS + ("Latitude", "Longitude", "Speed", "Course")
+# Column sets for logs saved without a header row, by field count
+KNOWN_SCHEMAS = {len(FLIGHT_COLUMNS): FLIGHT_COLUMNS, len(GPS_COLUMNS): GPS_COLUMNS}
+DELIMITERS = (b",", b";", b"\t")
+
+
+def sniff(raw):
+    # (delimiter, column names or None if headerless) from the first line only
+    first = raw[:65536].replace(b"\r", b"\n").split(b"\n", 1)[0]
+    delimiter = max(DELIMITERS, key=first.count)
+    if not first.strip():
+        return delimiter, None
+    fields = [f.strip().decode() for f in first.split(delimiter)]
+    try:
+        [float(f) for f in fields]
+        return delimiter, None
+    except ValueError:
+        return delimiter, fields
+
+
+def column_names(names, ncols):
+    if names is not None:
+        return names
+    return list(KNOWN_SCHEMAS.get(ncols, [f"col{i}" for i in range(ncols)]))
+
+
+def parse(raw, delimiter, names):
+    # Bare CR (the Eggtimer's own files) and CRLF both become LF
+    if b"\r" in raw:
+        raw = raw.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+    body = raw.partition(b"\n")[2] if names is not None else raw
+    if not body.strip():
+        # Header only, or an empty file: the columns exist but hold no samples
+        return np.empty((0, len(names) if names is not None else 0), order="F")
+    try:
+        # numpy's C reader: one pass, no per-row Python objects
+        table = np.loadtxt(io.BytesIO(body), delimiter=delimiter.decode(), dtype=np.float64, ndmin=2)
+    except ValueError:
+        # Short rows or empty fields: pad them with NaN row by row
+        rows = [line.split(delimiter) for line in body.split(b"\n") if line.strip()]
+        ncols = len(names) if names is not None else max(len(r) for r in rows)
+        table = np.full((len(rows), ncols), np.nan)
+        for i, row in enumerate(rows):
+            for j, field in enumerate(row[:ncols]):
+                if field.strip():
+                    table[i, j] = float(field)
+    return np.asfortranarray(table)
+
+
+def cache_dir():
+    root = (os.environ.get("XDG_CACHE_HOME") or os.environ.get("LOCALAPPDATA")
+            or os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(root, "pl26", "flight_logs")
+
+
+def cache_prefix(path, folder):
+    # One family of entries per log file: its name plus a hash of its full path
+    path = os.path.abspath(path)
+    key = hashlib.blake2b(path.encode(), digest_size=8).hexdigest()
+    return os.path.join(folder, f"{os.path.basename(path)}.{key}")
+
+
+def load_flight_log(path, cache=True, folder=None):
+    # Column name -> 1-D float64 array (a memory-mapped view when cached)
+    st = os.stat(path)
+    prefix = cache_prefix(path, folder or cache_dir())
+    stamp = f"{prefix}.{st.st_size:x}-{st.st_mtime_ns:x}."
+
+    table = None
+    if cache:
+        for entry in glob.glob(glob.escape(stamp) + "*.npy"):
+            try:
+                table = np.load(entry, mmap_mode="r")
+            except (OSError, ValueError):
+                continue
+            # The header comes from the log; only the numbers live in the cache
+            with open(path, "rb") as f:
+                _, header = sniff(f.read(65536))
+            return columns(header, table)
+
+    with open(path, "rb") as f:
+        raw = f.read()
+    delimiter, header = sniff(raw)
+    if cache:
+        remove_sidecars(path)
+        try:
+            table = cache_table(raw, delimiter, header, prefix, stamp)
+        except OSError:
+            table = None  # unwritable cache directory: still loaded, just not cached
+    if table is None:
+        table = parse(raw, delimiter, header)
+    return columns(header, table)
+
+
+def cache_table(raw, delimiter, header, prefix, stamp):
+    # Size or mtime changed: the content decides whether an old entry still fits
+    digest = hashlib.blake2b(raw, digest_size=16).hexdigest()
+    cached = f"{stamp}{digest}.npy"
+    old = glob.glob(glob.escape(prefix) + ".*.npy")
+    os.makedirs(os.path.dirname(prefix), exist_ok=True)
+    same = [entry for entry in old if entry.endswith(f".{digest}.npy")]
+    if same:
+        os.replace(same[0], cached)
+    else:
+        tmp = cached + ".part"
+        with open(tmp, "wb") as f:
+            np.save(f, parse(raw, delimiter, header))
+        os.replace(tmp, cached)
+    # Entries for earlier versions of this log are no longer reachable
+    for entry in old:
+        if entry != cached and os.path.exists(entry):
+            os.remove(entry)
+    return np.load(cached, mmap_mode="r")
+
+
+def remove_sidecars(path):
+    # Earlier versions cached next to the log as hidden .<name>.<hash16>.npy files
+    folder, name = os.path.split(os.path.abspath(path))
+    for entry in glob.glob(os.path.join(glob.escape(folder), f".{glob.escape(name)}.{'[0-9a-f]' * 16}.npy")):
+        try:
+            os.remove(entry)
+        except OSError:
+            pass
+
+
+def columns(header, table):
+    return {name: table[:, i] for i, name in enumerate(column_names(header, table.shape[1]))}
+
+
+def flight_log_path(default):
+    # Scripts take the log as their first argument, falling back to their default
+    args = [a for a in sys.argv[1:] if not a.startswith("-")]
+    return args[0] if args else default
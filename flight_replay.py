@@ -0,0 +1,115 @@
+import time
+
+import numpy as np
+
+from flight_log import load_flight_log
+
+# Replays a flight log from contiguous NumPy columns. The log is converted
+# once; each timer tick advances the replay clock and hands back a slice of
+# new rows, and plots read their history as views, so no tick touches pandas
+# or copies a column.
+
+REPLAY_SPEEDS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100)
+MIN_SPEED, MAX_SPEED = REPLAY_SPEEDS[0], REPLAY_SPEEDS[-1]
+
+# Eggtimer flag columns and the event each one marks
+EVENT_FLAGS = (("LDA", "Launch"), ("Apogee", "Apogee"), ("N-O", "Nose-over"),
+               ("Drogue", "Drogue"), ("Main", "Main"))
+
+
+def find_events(columns):
+    # [(name, row)] in flight order: the first row each flag is set, plus burnout
+    # as the filtered-velocity peak between launch and apogee
+    events = {}
+    for column, name in EVENT_FLAGS:
+        if column in columns:
+            rows = np.flatnonzero(columns[column] > 0)
+            if rows.size:
+                events[name] = int(rows[0])
+    velocity = columns.get("FVeloc", columns.get("Veloc"))
+    if velocity is not None and "Launch" in events:
+        start = events["Launch"]
+        stop = events.get("Apogee", len(velocity))
+        if stop > start:
+            events["Burnout"] = start + int(np.argmax(velocity[start:stop]))
+    return sorted(events.items(), key=lambda e: e[1])
+
+
+class FlightReplay:
+    def __init__(self, columns, time_column="T", speed=1.0):
+        # columns: name -> 1-D array, all the same length
+        self.columns = {name: np.ascontiguousarray(values, dtype=np.float64)
+                        for name, values in columns.items()}
+        self.names = list(self.columns)
+        self.t = self.columns[time_column]
+        self.length = len(self.t)
+        self.index = 0
+        self.clock = self.t[0] if self.length else 0.0
+        self.speed = speed
+        self._wall = None
+        self.events = find_events(self.columns)
+
+    @classmethod
+    def from_file(cls, path, time_column="T", speed=1.0):
+        return cls(load_flight_log(path), time_column, speed)
+
+    @property
+    def speed(self):
+        return self._speed
+
+    @speed.setter
+    def speed(self, value):
+        self._speed = min(max(float(value), MIN_SPEED), MAX_SPEED)
+
+    @property
+    def finished(self):
+        return self.index >= self.length
+
+    def __len__(self):
+        return self.length
+
+    def tick(self, now=None):
+        # Advance the replay clock by the wall time since the last tick, scaled
+        # by speed; returns the slice of rows that became due (may be empty).
+        now = time.monotonic() if now is None else now
+        if self._wall is None:
+            self._wall = now
+        self.clock += (now - self._wall) * self._speed
+        self._wall = now
+        return self.advance_to(self.clock)
+
+    def advance_to(self, t):
+        start = self.index
+        self.index = start + int(np.searchsorted(self.t[start:], t, side="right"))
+        return slice(start, self.index)
+
+    def seek(self, index):
+        # O(1): history() is a view, so nothing is rebuilt
+        self.index = min(max(int(index), 0), self.length)
+        self.clock = self.t[self.index - 1] if self.index else (self.t[0] if self.length else 0.0)
+        self._wall = None
+
+    def seek_time(self, t):
+        self.seek(np.searchsorted(self.t, t, side="right"))
+
+    def seek_event(self, name):
+        # Lands just after the event's row so it is part of the history
+        for event, row in self.events:
+            if event == name:
+                self.seek(row + 1)
+                return True
+        return False
+
+    def pause(self):
+        # The next tick() restarts the wall clock instead of jumping ahead
+        self._wall = None
+
+    def history(self, name):
+        return self.columns[name][:self.index]
+
+    def rows(self, name, rows):
+        return self.columns[name][rows]
+
+    def current(self, name):
+        # Value at the last replayed row, or None before the first
+        return self.columns[name][self.index - 1] if self.index else None
@@ -1,33 +1,31 @@
 import sys
-import csv
+import time
 import numpy as np
 from stl import mesh
-from PySide6.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QLabel, QStackedLayout
-from PySide6.QtGui import QQuaternion, QMatrix4x4
+from PySide6.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QLabel, QSlider
+from PySide6.QtGui import QMatrix4x4
 from PySide6.QtCore import QTimer, Qt
 import pyqtgraph.opengl as gl
 
+from attitude_track import AttitudeTrack
+
+FRAME_MS = 16  # redraw at display refresh; the log itself advances at 10 Hz
+
 class RocketLiveTelemetry(QMainWindow):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Rocket Rotation Visualisation")
         self.setMinimumSize(900, 700)
         
-        # 1. Load CSV Data
-        self.telemetry_data = []
+        # 1. Load CSV Data: every model matrix is computed here, once
         try:
-            with open('telemetry_data.csv', 'r') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    self.telemetry_data.append([
-                        float(row['w']), float(row['x']), 
-                        float(row['y']), float(row['z'])
-                    ])
+            self.track = AttitudeTrack.from_file('telemetry_data.csv')
         except FileNotFoundError:
             print("Error: telemetry_data.csv not found.")
             sys.exit()
 
-        self.current_frame = 0
+        self.current_frame = -1
+        self.start_time = time.monotonic()
 
         # 2. UI Setup - Using a QWidget as a container for the overlay
         self.container = QWidget()
@@ -44,6 +42,12 @@ class RocketLiveTelemetry(QMainWindow):
         self.view.setCameraPosition(distance=20)
         self.layout.addWidget(self.view)
 
+        # Scrubber: any row can be shown straight away
+        self.slider = QSlider(Qt.Orientation.Horizontal)
+        self.slider.setRange(0, len(self.track) - 1)
+        self.slider.sliderMoved.connect(self.seek)
+        self.layout.addWidget(self.slider)
+
         # Bottom Overlay Label
         self.overlay = QLabel(self.view) # Parented to the view
         self.overlay.setStyleSheet("""
@@ -59,10 +63,10 @@ class RocketLiveTelemetry(QMainWindow):
         # 3. Load the Red Rocket
         self.load_rocket("rocket.stl")
 
-        # 4. Playback Timer (10Hz)
+        # 4. Playback Timer (display rate; the row comes from the elapsed time)
         self.timer = QTimer()
         self.timer.timeout.connect(self.update_telemetry)
-        self.timer.start(100)
+        self.timer.start(FRAME_MS)
 
     def resizeEvent(self, event):
         """Keep the overlay at the bottom left when window is resized."""
@@ -89,28 +93,31 @@ class RocketLiveTelemetry(QMainWindow):
             self.view.addItem(self.rocket)
 
     def update_telemetry(self):
-        if not self.telemetry_data:
+        if not len(self.track):
             return
+        self.show_frame(self.track.frame_at(time.monotonic() - self.start_time))
+
+    def seek(self, frame):
+        # Playback carries on from the chosen row
+        self.start_time = time.monotonic() - frame * self.track.row_period
+        self.show_frame(frame)
+
+    def show_frame(self, frame):
+        if frame == self.current_frame:
+            return  # several refreshes per logged row: nothing new to upload
+        self.current_frame = frame
+        self.rocket.setTransform(QMatrix4x4(*self.track.matrix(frame)))
 
-        if self.current_frame >= len(self.telemetry_data):
-            self.current_frame = 0
-        
-        w, x, y, z = self.telemetry_data[self.current_frame]
-        quat = QQuaternion(w, x, y, z).normalized()
-        
-        transform = QMatrix4x4()
-        transform.scale(0.01, 0.01, 0.01)
-        transform.rotate(quat)
-        self.rocket.setTransform(transform)
-        
         # Update the small overlay text
+        w, x, y, z = self.track.quats[frame]
         self.overlay.setText(f"W: {w:.3f} | X: {x:.3f} | Y: {y:.3f} | Z: {z:.3f}")
         self.overlay.adjustSize()
-        
+
         # Position the overlay (bottom-left)
         self.overlay.move(10, self.view.height() - self.overlay.height() - 10)
-        
-        self.current_frame += 1
+
+        if not self.slider.isSliderDown():
+            self.slider.setValue(frame)
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
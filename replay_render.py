@@ -0,0 +1,159 @@
+import argparse
+import importlib
+import os
+import shutil
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from flight_log import load_flight_log
+
+# Renders a flight log to debrief frames without a display. Each worker process
+# opens one of the replay stations on Qt's offscreen platform, so the frames are
+# the station's own window (plots, selectors and timeline) exactly as operators
+# see it. Frame k seeks the replay to T = T0 + k * speed / fps, redraws through
+# the station's showHistory() and grabs the window; frames are split across a
+# process pool and written as a PNG sequence or piped through a local ffmpeg.
+# The output runs at a fixed fps however long each frame takes to draw.
+
+FPS = 30
+SIZE = (1280, 720)
+# Replay stations built on FlightReplay: PLOTSGroundStation with replay,
+# timer, timeline and showHistory()
+STATIONS = ("Eggtimer_3D_Map", "Eggtimer_3D", "Eggtimer_Test", "Test_3D")
+
+_worker = None
+
+
+class StationRenderer:
+    # One offscreen station window per worker process, reused for every frame
+    def __init__(self, station, path, size, top=None, bottom=None):
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        # The stations take their log from the command line (flight_log_path)
+        sys.argv = [station, path]
+        from PyQt5.QtWidgets import QApplication
+        from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
+
+        self.app = QApplication.instance() or QApplication(sys.argv)
+        self.window = importlib.import_module(station).PLOTSGroundStation()
+        self.window.timer.stop()
+        self.window.timeline.sync()
+        for attr, value in (("combo_top", top), ("variable_select", top), ("combo_bottom", bottom)):
+            combo = getattr(self.window, attr, None)
+            if combo is not None and value:
+                combo.setCurrentText(value)
+        self.size = size
+        self.window.resize(*size)
+        self.window.show()
+        self.canvases = self.window.findChildren(FigureCanvasQTAgg)
+        self.app.processEvents()
+
+    def draw(self, rows):
+        from PyQt5.QtCore import Qt
+        from PyQt5.QtGui import QImage
+
+        w = self.window
+        w.replay.seek(rows)
+        w.showHistory()
+        w.timeline.sync()
+        # draw_idle() waits for the event loop; frames need the plots drawn now
+        for canvas in self.canvases:
+            canvas.draw()
+        self.app.processEvents()
+        image = w.grab().toImage()
+        if (image.width(), image.height()) != self.size:
+            image = image.scaled(*self.size, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+        return image.convertToFormat(QImage.Format_RGBA8888)
+
+
+def frame_rows(t, fps, speed):
+    # Rows visible in each output frame, for all frames at once
+    times = t[0] + np.arange(int((t[-1] - t[0]) * fps / speed) + 2) * speed / fps
+    return np.searchsorted(t, times, side="right")
+
+
+def init_worker(station, path, size, top, bottom):
+    global _worker
+    _worker = StationRenderer(station, path, size, top, bottom)
+
+
+def render_png(job):
+    index, rows, out_dir = job
+    path = os.path.join(out_dir, f"frame_{index:06d}.png")
+    if not _worker.draw(rows).save(path, "PNG"):
+        raise RuntimeError(f"could not write {path}")
+
+
+def render_raw(job):
+    _, rows, _ = job
+    image = _worker.draw(rows)
+    bits = image.constBits()
+    bits.setsize(image.sizeInBytes())
+    return bytes(bits)
+
+
+def render(path, out, station=STATIONS[0], fps=FPS, speed=1.0, size=SIZE, workers=None,
+           top=None, bottom=None):
+    t = load_flight_log(path)["T"]
+    rows = frame_rows(t, fps, speed)
+    video = os.path.splitext(out)[1].lower() in (".mp4", ".mkv", ".webm", ".mov")
+    jobs = [(i, int(r), out) for i, r in enumerate(rows)]
+
+    encoder = None
+    if video:
+        ffmpeg = shutil.which("ffmpeg")
+        if ffmpeg is None:
+            raise RuntimeError("ffmpeg not found; render to a directory of PNG frames instead")
+        encoder = subprocess.Popen(
+            [ffmpeg, "-y", "-loglevel", "error", "-f", "rawvideo", "-pix_fmt", "rgba",
+             "-s", f"{size[0]}x{size[1]}", "-r", str(fps), "-i", "-",
+             "-pix_fmt", "yuv420p", out], stdin=subprocess.PIPE)
+    else:
+        os.makedirs(out, exist_ok=True)
+
+    initargs = (station, os.path.abspath(path), size, top, bottom)
+    with ProcessPoolExecutor(workers, initializer=init_worker, initargs=initargs) as pool:
+        # map() keeps frame order, so the encoder can take results as they come
+        results = pool.map(render_raw if video else render_png, jobs, chunksize=8)
+        for count, frame in enumerate(results, 1):
+            if encoder is not None:
+                encoder.stdin.write(frame)
+            if count % 100 == 0 or count == len(jobs):
+                print(f"  {count}/{len(jobs)} frames rendered...")
+    if encoder is not None:
+        encoder.stdin.close()
+        if encoder.wait() != 0:
+            raise RuntimeError("ffmpeg failed")
+    return len(jobs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a flight log replay to frames or video, headless")
+    parser.add_argument("log", help="Eggtimer CSV log")
+    parser.add_argument("out", help="directory for PNG frames, or a .mp4/.mkv/.webm/.mov file")
+    parser.add_argument("--station", choices=STATIONS, default=STATIONS[0], help="station window to render")
+    parser.add_argument("--fps", type=int, default=FPS)
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed (2 = twice real time)")
+    parser.add_argument("--top", help="variable for the top (or only) 2D plot")
+    parser.add_argument("--bottom", help="variable for the bottom 2D plot")
+    parser.add_argument("--size", default=f"{SIZE[0]}x{SIZE[1]}", help="frame size WxH")
+    parser.add_argument("--workers", type=int, help="render processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    if args.fps <= 0:
+        parser.error("--fps must be positive")
+    if args.speed <= 0:
+        parser.error("--speed must be positive")
+    t = load_flight_log(args.log).get("T")
+    if t is None or len(t) == 0:
+        parser.error(f"{args.log} has no samples to replay")
+    size = tuple(int(v) for v in args.size.lower().split("x"))
+    count = render(args.log, args.out, args.station, args.fps, args.speed, size, args.workers,
+                   args.top, args.bottom)
+    print(f"Rendered {count} frames to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
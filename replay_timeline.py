@@ -0,0 +1,83 @@
+from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtWidgets import QComboBox, QHBoxLayout, QLabel, QPushButton, QSlider, QVBoxLayout, QWidget
+
+from flight_replay import REPLAY_SPEEDS
+
+
+class ReplayTimeline(QWidget):
+    # Play/pause, a scrubber over every row, the replay speed and one button per
+    # flight event. Seeking only moves replay.index; the window redraws from the
+    # history views when `seeked` fires.
+    seeked = pyqtSignal()
+
+    def __init__(self, replay, timer, parent=None):
+        super().__init__(parent)
+        self.replay = replay
+        self.timer = timer
+
+        self.play_button = QPushButton("Pause")
+        self.play_button.clicked.connect(self.togglePlay)
+
+        self.slider = QSlider(Qt.Horizontal)
+        self.slider.setRange(0, len(replay))
+        self.slider.valueChanged.connect(self.seek)
+
+        self.time_label = QLabel()
+        self.time_label.setMinimumWidth(70)
+
+        self.speed_select = QComboBox()
+        self.speed_select.addItems([f"{s:g}x" for s in REPLAY_SPEEDS])
+        self.speed_select.setCurrentText(f"{replay.speed:g}x")
+        self.speed_select.currentIndexChanged.connect(self.changeSpeed)
+
+        top = QHBoxLayout()
+        top.addWidget(self.play_button)
+        top.addWidget(self.slider, 1)
+        top.addWidget(self.time_label)
+        top.addWidget(self.speed_select)
+
+        events = QHBoxLayout()
+        for name, row in replay.events:
+            button = QPushButton(f"{name} {replay.t[row] - replay.t[0]:.1f}s")
+            button.clicked.connect(lambda _, name=name: self.seekEvent(name))
+            events.addWidget(button)
+        events.addStretch(1)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addLayout(top)
+        layout.addLayout(events)
+        self.sync()
+
+    def togglePlay(self):
+        if self.timer.isActive():
+            self.timer.stop()
+        else:
+            if self.replay.finished:
+                self.seek(0)
+            self.replay.pause()
+            self.timer.start()
+        self.sync()
+
+    def changeSpeed(self, i):
+        self.replay.speed = REPLAY_SPEEDS[i]
+
+    def seek(self, index):
+        self.replay.seek(index)
+        self.seeked.emit()
+        self.sync()
+
+    def seekEvent(self, name):
+        if self.replay.seek_event(name):
+            self.seeked.emit()
+            self.sync()
+
+    def sync(self):
+        # Called after every tick; moves the slider without seeking again
+        self.slider.blockSignals(True)
+        self.slider.setValue(self.replay.index)
+        self.slider.blockSignals(False)
+        t = self.replay.t
+        elapsed = t[self.replay.index - 1] - t[0] if self.replay.index else 0.0
+        self.time_label.setText(f"{elapsed:.2f} s")
+        self.play_button.setText("Pause" if self.timer.isActive() else "Play")
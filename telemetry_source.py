@@ -0,0 +1,132 @@
+import time
+
+import numpy as np
+
+from flight_replay import FlightReplay
+
+# Where the ground station's packets come from. Each source hands back the raw
+# UART lines that arrived since the last poll, so a recorded flight goes
+# through exactly the parsing, plotting and map code of a live one:
+#   SerialSource  the radio on the Pi's UART
+#   ReplaySource  a flight log, rows released on their own T timestamps
+
+SERIAL_PORT = "/dev/ttyAMA0"
+BAUD_RATE = 115200
+
+# UART packet fields in order, and the log columns that can supply each one
+PACKET_FIELDS = ("Alt", "Veloc", "Lat", "Lon", "qR", "qI", "qJ", "qK", "RSSI")
+LOG_COLUMNS = {"Lat": ("Lat", "Latitude"), "Lon": ("Lon", "Longitude")}
+# Value for fields the log does not have: level attitude, no signal reading
+DEFAULTS = {"qR": 1.0, "RSSI": 0.0}
+
+
+class SerialSource:
+    def __init__(self, port=SERIAL_PORT, baud=BAUD_RATE):
+        import serial
+
+        self.name = port
+        self.ser = serial.Serial(port, baud, timeout=0.05)
+        self.ser.reset_input_buffer()
+        self.start_time = time.time()
+
+    def read_lines(self):
+        lines = []
+        while self.ser.in_waiting:
+            lines.append(self.ser.readline().decode("ascii", errors="ignore").strip())
+        return lines
+
+    def elapsed(self):
+        # Packets carry no timestamp; they are stamped on arrival
+        return time.time() - self.start_time
+
+    def close(self):
+        self.ser.close()
+
+
+def filled(values):
+    # Gaps (GPS rows before a fix, padded short rows) repeat the last good value
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+    if valid.all() or not valid.any():
+        return np.nan_to_num(values)
+    last = np.maximum.accumulate(np.where(valid, np.arange(len(values)), 0))
+    values = values[last]
+    values[:np.argmax(valid)] = values[np.argmax(valid)]
+    return values
+
+
+def packet_lines(columns):
+    # Every log row as the line the rocket would have sent for it
+    fields = []
+    for field in PACKET_FIELDS:
+        source = next((c for c in LOG_COLUMNS.get(field, (field,)) if c in columns), None)
+        if source is None:
+            fields.append(np.full(len(columns["T"]), DEFAULTS.get(field, 0.0)))
+        else:
+            fields.append(filled(columns[source]))
+    *floats, rssi = fields
+    return [f"{alt:.2f},{veloc:.2f},{lat:.7f},{lon:.7f},{qr:.4f},{qi:.4f},{qj:.4f},{qk:.4f},{int(r)}"
+            for alt, veloc, lat, lon, qr, qi, qj, qk, r in zip(*(f.tolist() for f in floats), rssi.tolist())]
+
+
+class ReplaySource:
+    # Rows are due at their log time T, scaled by speed, on the monotonic clock.
+    # FlightReplay's clock is the running sum of measured wall intervals, so a
+    # late or skipped timer tick is made up on the next one instead of pushing
+    # the rest of the flight back: a row is never more than one tick late.
+    def __init__(self, path, speed=1.0):
+        self.name = path
+        self.replay = FlightReplay.from_file(path, speed=speed)
+        self.lines = packet_lines(self.replay.columns)
+        self.paused = False
+        # Wall seconds between a row's due time and its release, for benchmarking
+        self.lag = 0.0
+
+    @property
+    def speed(self):
+        return self.replay.speed
+
+    @speed.setter
+    def speed(self, value):
+        self.replay.speed = value
+
+    @property
+    def finished(self):
+        return self.replay.finished
+
+    def read_lines(self):
+        if self.paused or self.replay.finished:
+            return []
+        rows = self.replay.tick()
+        if rows.stop > rows.start:
+            self.lag = (self.replay.clock - self.replay.t[rows.stop - 1]) / self.replay.speed
+        return self.lines[rows]
+
+    def pause(self):
+        self.paused = True
+
+    def resume(self):
+        self.paused = False
+        self.replay.pause()
+
+    def step(self):
+        # Pauses, then releases exactly one row on the next poll
+        self.paused = True
+        if not self.replay.finished:
+            self.replay.seek(self.replay.index + 1)
+            return [self.lines[self.replay.index - 1]]
+        return []
+
+    def elapsed(self):
+        # Log time of the last released row, so plots keep the flight's own time base
+        t = self.replay.t
+        return t[self.replay.index - 1] - t[0] if self.replay.index else 0.0
+
+    def close(self):
+        pass
+
+
+def open_source(replay=None, speed=1.0, port=SERIAL_PORT, baud=BAUD_RATE):
+    if replay:
+        return ReplaySource(replay, speed)
+    return SerialSource(port, baud)
@@ -3,7 +3,6 @@ import sys
 import time
 import os
 import serial
-import csv
 import numpy as np
 from collections import deque
 from stl import mesh
@@ -14,12 +13,14 @@ from PySide6.QtWidgets import (
     QHBoxLayout, QLabel, QComboBox, QStackedWidget
 )
 from PySide6.QtCore import QTimer, Qt
-from PySide6.QtGui import QPixmap, QFont, QFontDatabase, QQuaternion, QMatrix4x4
+from PySide6.QtGui import QPixmap, QFont, QFontDatabase, QMatrix4x4
 
 from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 import pyqtgraph.opengl as gl
 
+from attitude_track import AttitudeTrack
+
 # -------------------- Platform-safe paths --------------------
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 ASSETS_DIR = os.path.join(BASE_DIR, "Assets")
@@ -99,25 +100,20 @@ class RocketRotationWidget(gl.GLViewWidget):
         self.addItem(self.grid)
         self.setCameraPosition(distance=20)
         
-        self.telemetry_data = []
+        # All model matrices are built here; each tick only picks a row
         try:
             if os.path.exists('telemetry_data.csv'):
-                with open('telemetry_data.csv', 'r') as f:
-                    reader = csv.DictReader(f)
-                    for row in reader:
-                        self.telemetry_data.append([
-                            float(row['w']), float(row['x']), 
-                            float(row['y']), float(row['z'])
-                        ])
+                self.track = AttitudeTrack.from_file('telemetry_data.csv')
             else:
                 raise FileNotFoundError
         except:
             # Generate dummy spin if CSV is missing
-            for i in range(200):
-                angle = np.radians(i * 1.8)
-                self.telemetry_data.append([np.cos(angle/2), 0, np.sin(angle/2), 0])
-            
-        self.current_frame = 0
+            angle = np.radians(np.arange(200) * 1.8)
+            zero = np.zeros_like(angle)
+            self.track = AttitudeTrack(np.column_stack([np.cos(angle/2), zero, np.sin(angle/2), zero]))
+
+        self.current_frame = -1
+        self.start_time = time.monotonic()
         self.overlay = QLabel(self) 
         self.overlay.setStyleSheet("""
             color: white; 
@@ -152,21 +148,18 @@ class RocketRotationWidget(gl.GLViewWidget):
             self.addItem(self.rocket)
 
     def update_telemetry(self):
-        if not self.telemetry_data: return
-        if self.current_frame >= len(self.telemetry_data): self.current_frame = 0
-        
-        w, x, y, z = self.telemetry_data[self.current_frame]
-        quat = QQuaternion(w, x, y, z).normalized()
-        
-        transform = QMatrix4x4()
-        transform.scale(0.01, 0.01, 0.01)
-        transform.rotate(quat)
-        self.rocket.setTransform(transform)
-        
+        if not len(self.track): return
+        self.show_frame(self.track.frame_at(time.monotonic() - self.start_time))
+
+    def show_frame(self, frame):
+        if frame == self.current_frame: return
+        self.current_frame = frame
+        self.rocket.setTransform(QMatrix4x4(*self.track.matrix(frame)))
+
+        w, x, y, z = self.track.quats[frame]
         self.overlay.setText(f"W: {w:.3f} | X: {x:.3f} | Y: {y:.3f} | Z: {z:.3f}")
         self.overlay.adjustSize()
         self.overlay.move(10, self.height() - self.overlay.height() - 10)
-        self.current_frame += 1
 
 # -------------------- Main Mission Control --------------------
 
@@ -0,0 +1,63 @@
+import os
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class StandInTileServer:
+    # Local stand-in for a tile server. Each path answers from a script of
+    # (status, headers, body) responses, one per request; the last one repeats.
+    # Every request is logged as (monotonic time, path, headers).
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+        self._lock = Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                return
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests.append((time.monotonic(), self.path, dict(self.headers)))
+                    script = server.routes.get(self.path)
+                    if not script:
+                        status, headers, body = 404, {}, b""
+                    else:
+                        status, headers, body = script[0] if len(script) == 1 else script.pop(0)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/{{z}}/{{x}}/{{y}}.png"
+
+    def route(self, z, x, y, *responses):
+        self.routes[f"/{z}/{x}/{y}.png"] = list(responses)
+
+    def requests_for(self, z, x, y):
+        return [r for r in self.requests if r[1] == f"/{z}/{x}/{y}.png"]
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def tile_server():
+    server = StandInTileServer()
+    yield server
+    server.close()
@@ -0,0 +1,63 @@
+import os
+
+import pytest
+
+from tile_archive import TileArchive, archive_path, open_tile_store, pack_tiles
+from tile_manifest import TileManifest
+from tile_server import TileDirectory
+
+TILES = [(12, x, 1300) for x in range(2017, 2021)]
+
+
+def packed(tmp_path, layout):
+    tiles = TileDirectory(str(tmp_path), layout)
+    for z, x, y in TILES:
+        tiles.put(z, x, y, b"tile %d" % x)
+    pack_tiles(str(tmp_path), archive_path(str(tmp_path), layout))
+    return tiles
+
+
+def age(root, seconds=10):
+    # Back-date the whole tree instead of sleeping past the mtime resolution
+    for dirpath, _, files in os.walk(root):
+        for path in [dirpath] + [os.path.join(dirpath, f) for f in files]:
+            st = os.stat(path)
+            os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns - int(seconds * 1e9)))
+
+
+@pytest.mark.parametrize("layout", ["nested", "flat"])
+def test_fresh_archive_is_served(tmp_path, layout):
+    packed(tmp_path, layout)
+
+    store = open_tile_store(str(tmp_path), layout=layout)
+
+    assert isinstance(store, TileArchive)
+    assert bytes(store.get(*TILES[0])) == b"tile 2017"
+
+
+@pytest.mark.parametrize("layout", ["nested", "flat"])
+def test_tiles_written_after_packing_are_served(tmp_path, layout):
+    tiles = packed(tmp_path, layout)
+    age(tmp_path)
+    tiles.put(*TILES[1], b"rewritten")
+
+    store = open_tile_store(str(tmp_path), layout=layout)
+
+    assert isinstance(store, TileDirectory)
+    assert store.get(*TILES[1]) == b"rewritten"
+
+
+def test_manifest_record_after_packing_skips_archive(tmp_path):
+    packed(tmp_path, "nested")
+    age(tmp_path)
+    TileManifest(str(tmp_path)).record(13, 1, 2, b"tile")
+
+    assert isinstance(open_tile_store(str(tmp_path)), TileDirectory)
+
+
+def test_manifest_summary_alone_keeps_archive(tmp_path):
+    packed(tmp_path, "nested")
+    age(tmp_path)
+    TileManifest(str(tmp_path)).plan(TILES)
+
+    assert isinstance(open_tile_store(str(tmp_path)), TileArchive)
@@ -0,0 +1,104 @@
+import os
+import time
+
+from tile_downloader import TileDownloader, TokenBucket
+from tile_server import TileDirectory
+
+FAST = dict(rate=1000, burst=100, backoff=0.01)
+
+
+def tile_bytes(n, seed=0):
+    # Not a valid PNG on purpose: the downloader must store bytes as received
+    return bytes((i * 31 + seed) % 256 for i in range(n))
+
+
+def test_saves_bytes_exactly(tile_server, tmp_path):
+    tiles = [(12, 2000 + i, 1300) for i in range(3)]
+    for i, tile in enumerate(tiles):
+        tile_server.route(*tile, (200, {"Content-Type": "image/png"}, tile_bytes(5000 + i, i)))
+    sink = TileDirectory(str(tmp_path))
+
+    ok, failed = TileDownloader(sink, url=tile_server.url, **FAST).download(tiles)
+
+    assert (ok, failed) == (3, 0)
+    for i, tile in enumerate(tiles):
+        with open(sink.tile_path(*tile), "rb") as f:
+            assert f.read() == tile_bytes(5000 + i, i)
+
+
+def test_stored_tiles_are_not_fetched_again(tile_server, tmp_path):
+    tile_server.route(12, 1, 2, (200, {}, b"tile"))
+    sink = TileDirectory(str(tmp_path))
+    downloader = TileDownloader(sink, url=tile_server.url, **FAST)
+
+    downloader.download([(12, 1, 2)])
+    downloader.download([(12, 1, 2)])
+
+    assert len(tile_server.requests_for(12, 1, 2)) == 1
+
+
+def test_429_waits_for_retry_after(tile_server, tmp_path):
+    tile_server.route(12, 1, 2, (429, {"Retry-After": "1"}, b""), (200, {}, b"tile"))
+    sink = TileDirectory(str(tmp_path))
+
+    ok, failed = TileDownloader(sink, url=tile_server.url, **FAST).download([(12, 1, 2)])
+
+    assert (ok, failed) == (1, 0)
+    (t0, *_), (t1, *_) = tile_server.requests_for(12, 1, 2)
+    assert t1 - t0 >= 0.95
+    assert sink.get(12, 1, 2) == b"tile"
+
+
+def test_retries_server_errors_then_succeeds(tile_server, tmp_path):
+    tile_server.route(12, 1, 2, (503, {}, b""), (502, {}, b""), (200, {}, b"tile"))
+    sink = TileDirectory(str(tmp_path))
+
+    r = TileDownloader(sink, url=tile_server.url, retries=4, **FAST).fetch(12, 1, 2)
+
+    assert r.status_code == 200 and r.content == b"tile"
+    assert len(tile_server.requests_for(12, 1, 2)) == 3
+
+
+def test_gives_up_after_retries(tile_server, tmp_path):
+    tile_server.route(12, 1, 2, (503, {}, b""))
+    sink = TileDirectory(str(tmp_path))
+
+    ok, failed = TileDownloader(sink, url=tile_server.url, retries=2, **FAST).download([(12, 1, 2)])
+
+    assert (ok, failed) == (0, 1)
+    assert len(tile_server.requests_for(12, 1, 2)) == 3
+    assert not os.path.exists(sink.tile_path(12, 1, 2))
+
+
+def test_client_errors_are_not_retried(tile_server, tmp_path):
+    tile_server.route(12, 1, 2, (404, {}, b""))
+    sink = TileDirectory(str(tmp_path))
+
+    assert TileDownloader(sink, url=tile_server.url, **FAST).fetch(12, 1, 2) is None
+    assert len(tile_server.requests_for(12, 1, 2)) == 1
+
+
+def test_rate_limit_holds_across_workers(tile_server, tmp_path):
+    rate, burst, count = 20.0, 2, 12
+    tiles = [(12, i, 0) for i in range(count)]
+    for tile in tiles:
+        tile_server.route(*tile, (200, {}, b"tile"))
+    sink = TileDirectory(str(tmp_path))
+
+    TileDownloader(sink, url=tile_server.url, workers=4, rate=rate, burst=burst).download(tiles)
+
+    times = sorted(t for t, *_ in tile_server.requests)
+    assert len(times) == count
+    # After the initial burst, requests come no faster than `rate` per second
+    assert times[-1] - times[0] >= (count - burst) / rate * 0.9
+
+
+def test_token_bucket_allows_burst_then_paces():
+    bucket = TokenBucket(rate=50.0, burst=5)
+    t0 = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    assert time.monotonic() - t0 < 0.05
+    for _ in range(5):
+        bucket.acquire()
+    assert time.monotonic() - t0 >= 5 / 50.0 * 0.9
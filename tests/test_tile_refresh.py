@@ -0,0 +1,92 @@
+import os
+
+from tile_downloader import TileDownloader
+from tile_manifest import TileManifest
+from tile_server import TileDirectory
+
+TILE = (12, 2017, 1300)
+FAST = dict(rate=1000, burst=100, backoff=0.01)
+
+
+def downloader(tile_server, tmp_path):
+    sink = TileDirectory(str(tmp_path))
+    manifest = TileManifest(str(tmp_path))
+    return TileDownloader(sink, url=tile_server.url, manifest=manifest, **FAST)
+
+
+def stored(dl, tile=TILE):
+    with open(dl.sink.tile_path(*tile), "rb") as f:
+        return f.read()
+
+
+def test_304_keeps_tile_and_sends_validators(tile_server, tmp_path):
+    tile_server.route(*TILE, (200, {"ETag": '"v1"'}, b"old"), (304, {"ETag": '"v1"'}, b""))
+    dl = downloader(tile_server, tmp_path)
+    dl.download([TILE])
+
+    assert dl.refresh([TILE]) == (0, 1, 0)
+    _, _, headers = tile_server.requests_for(*TILE)[-1]
+    assert headers["If-None-Match"] == '"v1"'
+    assert stored(dl) == b"old"
+
+
+def test_304_records_tiles_missing_from_the_manifest(tile_server, tmp_path):
+    # Stored before the manifest existed: no record, only the file
+    dl = downloader(tile_server, tmp_path)
+    dl.sink.put(*TILE, b"old")
+    tile_server.route(*TILE, (304, {"ETag": '"v1"'}, b""))
+
+    assert dl.refresh([TILE]) == (0, 1, 0)
+    _, _, headers = tile_server.requests_for(*TILE)[-1]
+    assert "If-Modified-Since" in headers
+
+    records = dl.manifest.records()
+    assert records[TILE][0] == 3 and records[TILE][2] == '"v1"'
+    dl.manifest.plan([TILE])
+    assert dl.manifest.missing_tiles() == []
+
+
+def test_same_bytes_on_200_are_not_rewritten(tile_server, tmp_path):
+    tile_server.route(*TILE, (200, {"ETag": '"v1"'}, b"same"), (200, {"ETag": '"v2"'}, b"same"))
+    dl = downloader(tile_server, tmp_path)
+    dl.download([TILE])
+    path = dl.sink.tile_path(*TILE)
+    os.utime(path, ns=(1, 1))
+
+    assert dl.refresh([TILE]) == (0, 1, 0)
+    assert os.stat(path).st_mtime_ns == 1
+    # The new validators are kept so the next refresh can get a 304
+    assert dl.manifest.records()[TILE][2] == '"v2"'
+
+
+def test_changed_bytes_are_rewritten(tile_server, tmp_path):
+    tile_server.route(*TILE, (200, {"ETag": '"v1"'}, b"old"), (200, {"ETag": '"v2"'}, b"new tile"))
+    dl = downloader(tile_server, tmp_path)
+    dl.download([TILE])
+
+    assert dl.refresh([TILE]) == (1, 0, 0)
+    assert stored(dl) == b"new tile"
+    size, _, etag, _ = dl.manifest.records()[TILE]
+    assert (size, etag) == (8, '"v2"')
+
+
+def test_deleted_tile_is_fetched_unconditionally(tile_server, tmp_path):
+    tile_server.route(*TILE, (200, {"ETag": '"v1"'}, b"old"), (200, {"ETag": '"v1"'}, b"old"))
+    dl = downloader(tile_server, tmp_path)
+    dl.download([TILE])
+    os.remove(dl.sink.tile_path(*TILE))
+
+    assert dl.refresh([TILE]) == (1, 0, 0)
+    _, _, headers = tile_server.requests_for(*TILE)[-1]
+    assert "If-None-Match" not in headers
+    assert stored(dl) == b"old"
+
+
+def test_failed_refresh_is_counted(tile_server, tmp_path):
+    tile_server.route(*TILE, (200, {}, b"old"), (503, {}, b""))
+    dl = downloader(tile_server, tmp_path)
+    dl.retries = 1
+    dl.download([TILE])
+
+    assert dl.refresh([TILE]) == (0, 0, 1)
+    assert stored(dl) == b"old"
@@ -1,7 +1,5 @@
 import os
 import requests
-from PIL import Image
-from io import BytesIO
 import math
 
 # Tile source URL (OpenStreetMap or another provider)
@@ -31,19 +29,21 @@ def download_tile(x, y, z):
     url = TILE_URL.format(s="a", x=x, y=y, z=z)
     response = requests.get(url)
     
+    # Keep the server's bytes as-is; decoding and re-saving with PIL only costs CPU
     if response.status_code == 200:
-        return Image.open(BytesIO(response.content))
+        return response.content
     else:
         print(f"Error fetching tile ({x}, {y}, {z})")
         return None
 
 # Function to save tile as PNG
-def save_tile(x, y, z, tile_image):
+def save_tile(x, y, z, tile_data):
     if not os.path.exists(TILE_SAVE_PATH):
         os.makedirs(TILE_SAVE_PATH)
     
     file_path = os.path.join(TILE_SAVE_PATH, f"{z}_{x}_{y}.png")
-    tile_image.save(file_path)
+    with open(file_path, "wb") as f:
+        f.write(tile_data)
     print(f"Saved tile: {file_path}")
 
 # Main function to download tiles in a bounding box
@@ -62,10 +62,10 @@ def download_tiles(lat, lon, zoom_levels):
                 y = tile_y + dy
                 
                 # Download the tile
-                tile_image = download_tile(x, y, zoom)
+                tile_data = download_tile(x, y, zoom)
                 
-                if tile_image:
-                    save_tile(x, y, zoom, tile_image)
+                if tile_data:
+                    save_tile(x, y, zoom, tile_data)
 
 # Entry point
 if __name__ == "__main__":
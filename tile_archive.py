@@ -0,0 +1,212 @@
+import argparse
+import hashlib
+import mmap
+import os
+import re
+import struct
+from bisect import bisect_left
+from threading import Lock
+
+from tile_manifest import TileManifest
+from tile_server import TileDirectory, TileFile
+
+# Single-file tile archive, laid out like a minimal PMTiles:
+#   header | tile data in Hilbert order | ids (u64) | offsets (u64) | lengths (u32)
+# Tile IDs number every zoom level along a Hilbert curve, so tiles that are
+# close on the map are close in the file and in the sorted index.
+
+TILE_ARCHIVE = "tiles-{layout}.pl26"  # kept inside the tile directory it was packed from
+MAGIC = b"PL26TILE"
+VERSION = 1
+HEADER = struct.Struct("<8sIIQQ")
+
+NESTED_TILE = re.compile(r"(\d+)[/\\](\d+)[/\\](\d+)\.png$")
+FLAT_TILE = re.compile(r"(\d+)_(\d+)_(\d+)\.png$")
+
+
+def hilbert_index(z, x, y):
+    n = 1 << z
+    d = 0
+    s = n >> 1
+    while s > 0:
+        rx = 1 if x & s else 0
+        ry = 1 if y & s else 0
+        d += s * s * ((3 * rx) ^ ry)
+        if ry == 0:
+            if rx == 1:
+                x = n - 1 - x
+                y = n - 1 - y
+            x, y = y, x
+        s >>= 1
+    return d
+
+
+def tile_id(z, x, y):
+    # All tiles of lower zooms come first: (4^z - 1) / 3 of them
+    return ((1 << (2 * z)) - 1) // 3 + hilbert_index(z, x, y)
+
+
+def scan_tiles(root):
+    # Accepts both tiles/{z}/{x}/{y}.png and tiles/{z}_{x}_{y}.png
+    for dirpath, _, files in os.walk(root):
+        for fname in files:
+            path = os.path.join(dirpath, fname)
+            rel = os.path.relpath(path, root)
+            m = NESTED_TILE.search(rel) or FLAT_TILE.match(fname)
+            if m:
+                z, x, y = (int(v) for v in m.groups())
+                yield z, x, y, path
+
+
+def pack_tiles(root, out_path):
+    tiles = sorted((tile_id(z, x, y), path) for z, x, y, path in scan_tiles(root))
+    ids, offsets, lengths = [], [], []
+    seen = {}
+
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as out:
+        out.write(b"\0" * HEADER.size)
+        for tid, path in tiles:
+            with open(path, "rb") as f:
+                data = f.read()
+            digest = hashlib.blake2b(data, digest_size=16).digest()
+            if digest not in seen:
+                seen[digest] = (out.tell(), len(data))
+                out.write(data)
+            offset, length = seen[digest]
+            ids.append(tid)
+            offsets.append(offset)
+            lengths.append(length)
+
+        out.write(b"\0" * (-out.tell() % 8))
+        index_offset = out.tell()
+        count = len(ids)
+        out.write(struct.pack(f"<{count}Q", *ids))
+        out.write(struct.pack(f"<{count}Q", *offsets))
+        out.write(struct.pack(f"<{count}I", *lengths))
+
+        out.seek(0)
+        out.write(HEADER.pack(MAGIC, VERSION, count, index_offset, HEADER.size))
+    os.replace(tmp_path, out_path)
+    # The rename touched the tile directory; the archive must not look older than it
+    os.utime(out_path)
+    return len(ids), len(seen)
+
+
+class TileArchive:
+    # Read-only tile store over a packed archive; no per-tile open() or copy of the index
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._version = os.fstat(self._file.fileno()).st_mtime_ns
+        self._lock = Lock()  # for the seek()/read() fallback on the shared file
+        magic, version, count, index_offset, _ = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} tile archive")
+
+        view = memoryview(self._mm)
+        ids_end = index_offset + 8 * count
+        offsets_end = ids_end + 8 * count
+        self.count = count
+        self._ids = view[index_offset:ids_end].cast("Q")
+        self._offsets = view[ids_end:offsets_end].cast("Q")
+        self._lengths = view[offsets_end:offsets_end + 4 * count].cast("I")
+
+    def __len__(self):
+        return self.count
+
+    def locate(self, z, x, y):
+        tid = tile_id(z, x, y)
+        i = bisect_left(self._ids, tid)
+        if i == self.count or self._ids[i] != tid:
+            return None
+        return self._offsets[i], self._lengths[i]
+
+    def get(self, z, x, y):
+        loc = self.locate(z, x, y)
+        if loc is None:
+            return None
+        offset, length = loc
+        return self._mm[offset:offset + length]
+
+    def open_tile(self, z, x, y):
+        # Deduplicated tiles share an offset, so offset+length identifies content
+        loc = self.locate(z, x, y)
+        if loc is None:
+            return None
+        offset, length = loc
+        return TileFile(self._file, offset, length, f'"{self._version:x}-{offset:x}-{length:x}"', False, self._lock)
+
+    def prefetch(self, z, x, y):
+        loc = self.locate(z, x, y)
+        if loc is None or not hasattr(mmap, "MADV_WILLNEED"):
+            return
+        offset, length = loc
+        start = offset - offset % mmap.PAGESIZE
+        self._mm.madvise(mmap.MADV_WILLNEED, start, offset + length - start)
+
+
+def archive_path(tile_dir, layout="nested"):
+    return os.path.join(tile_dir, TILE_ARCHIVE.format(layout=layout))
+
+
+def tile_dirs(tile_dir, layout="nested"):
+    # Directories that hold tiles: the root itself (flat) or every {z}/{x} (nested)
+    if layout == "flat":
+        return [tile_dir]
+    dirs = [tile_dir]
+    for _ in range(2):
+        subdirs = []
+        for d in dirs:
+            try:
+                with os.scandir(d) as entries:
+                    subdirs += [e.path for e in entries if e.is_dir() and e.name.isdigit()]
+            except OSError:
+                pass
+        dirs = subdirs
+    return dirs
+
+
+def tiles_changed_since(tile_dir, mtime_ns, layout="nested"):
+    # Tiles are always written to a temporary name and renamed into place
+    # (downloads, refresh rewrites, recompression), so any new or rewritten tile
+    # bumps the mtime of its directory; one stat() per directory, none per tile.
+    paths = tile_dirs(tile_dir, layout) + [TileManifest(tile_dir).log_path]
+    for path in paths:
+        try:
+            if os.stat(path).st_mtime_ns > mtime_ns:
+                return True
+        except OSError:
+            pass
+    return False
+
+
+def open_tile_store(tile_dir, archive=None, layout="nested"):
+    # Prefer the packed archive when one has been built in the tile directory,
+    # unless tiles were written to the directory after it was packed
+    archive = archive or archive_path(tile_dir, layout)
+    if os.path.exists(archive):
+        if not tiles_changed_since(tile_dir, os.stat(archive).st_mtime_ns, layout):
+            return TileArchive(archive)
+        print(f"WARNING: {tile_dir} changed since {archive} was packed; serving the directory. "
+              f"Repack with: python tile_archive.py {tile_dir} --layout {layout}")
+    return TileDirectory(tile_dir, layout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack a tile directory into a single mmap-able archive")
+    parser.add_argument("tile_dir", help="tiles/{z}/{x}/{y}.png or tiles/{z}_{x}_{y}.png")
+    parser.add_argument("archive", nargs="?", help="output archive path (default: inside tile_dir)")
+    parser.add_argument("--layout", choices=("nested", "flat"), default="nested",
+                        help="layout of the map scripts that will open it, for the default name")
+    args = parser.parse_args()
+
+    archive = args.archive or archive_path(args.tile_dir, args.layout)
+    count, unique = pack_tiles(args.tile_dir, archive)
+    size = os.path.getsize(archive)
+    print(f"Packed {count} tiles ({unique} unique) into {archive}: {size / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
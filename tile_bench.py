@@ -0,0 +1,108 @@
+import argparse
+import http.client
+import os
+import queue
+import tempfile
+import time
+from http.server import HTTPServer
+from threading import Thread
+
+from tile_server import TileCache, TileDirectory, TileHandler, make_server
+
+# Simulated full-screen pan: a 1920x1080 viewport is 8x5 tiles plus a one-tile
+# margin, shifted one column per step the way Leaflet requests them.
+VIEW_COLS, VIEW_ROWS = 10, 7
+ZOOM = 16
+ORIGIN_X, ORIGIN_Y = 32220, 21260
+PARALLEL_FETCHES = 6  # Chromium's per-host connection limit
+TILE_BYTES = 20 * 1024
+
+
+def pan_requests(steps):
+    reqs = []
+    for step in range(steps):
+        for dx in range(VIEW_COLS):
+            for dy in range(VIEW_ROWS):
+                reqs.append((ZOOM, ORIGIN_X + step + dx, ORIGIN_Y + dy))
+    return reqs
+
+
+def make_tiles(root, steps):
+    for z, x, y in set(pan_requests(steps)):
+        os.makedirs(os.path.join(root, str(z), str(x)), exist_ok=True)
+        with open(os.path.join(root, str(z), str(x), f"{y}.png"), "wb") as f:
+            f.write(os.urandom(TILE_BYTES))
+
+
+def worker(port, jobs, latencies, keepalive):
+    conn = http.client.HTTPConnection("localhost", port)
+    while True:
+        try:
+            z, x, y = jobs.get_nowait()
+        except queue.Empty:
+            break
+        t0 = time.perf_counter()
+        conn.request("GET", f"/{z}/{x}/{y}.png")
+        resp = conn.getresponse()
+        resp.read()
+        latencies.append(time.perf_counter() - t0)
+        if not keepalive or resp.will_close:
+            conn.close()
+            conn = http.client.HTTPConnection("localhost", port)
+    conn.close()
+
+
+def run(httpd, reqs, keepalive):
+    Thread(target=httpd.serve_forever, daemon=True).start()
+    jobs = queue.Queue()
+    for r in reqs:
+        jobs.put(r)
+    latencies = []
+    threads = [Thread(target=worker, args=(httpd.server_port, jobs, latencies, keepalive))
+               for _ in range(PARALLEL_FETCHES)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    httpd.shutdown()
+    httpd.server_close()
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    return len(latencies) / elapsed, p50, p99
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tile server load benchmark")
+    parser.add_argument("--tiles", help="nested tile directory (default: generate synthetic tiles)")
+    parser.add_argument("--steps", type=int, default=40, help="pan steps")
+    args = parser.parse_args()
+
+    reqs = pan_requests(args.steps)
+    with tempfile.TemporaryDirectory() as tmp:
+        root = args.tiles or tmp
+        if not args.tiles:
+            make_tiles(root, args.steps)
+        store = TileDirectory(root)
+
+        legacy_handler = type("LegacyHandler", (TileHandler,),
+                              {"store": store, "protocol_version": "HTTP/1.0"})
+        legacy = HTTPServer(("localhost", 0), legacy_handler)
+        results = {
+            "HTTPServer, HTTP/1.0": run(legacy, reqs, keepalive=False),
+            "tile_server, keep-alive": run(make_server(store, port=0), reqs, keepalive=True),
+        }
+        cache = TileCache(store)
+        run(make_server(cache, port=0), reqs, keepalive=True)
+        results["tile_server, warm cache"] = run(make_server(cache, port=0), reqs, keepalive=True)
+
+    print(f"{len(reqs)} requests, {PARALLEL_FETCHES} parallel fetches")
+    for name, (rate, p50, p99) in results.items():
+        print(f"  {name:<24} {rate:8.0f} tiles/s   p50 {p50:6.2f} ms   p99 {p99:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import argparse
+import csv
+import math
+
+from tile_downloader import TileDownloader, bbox_tiles
+from tile_manifest import TileManifest
+from tile_prefetch import EARTH_RADIUS_M, latlon_to_tile_xy
+from tile_server import TileDirectory
+
+# Plans the tiles a flight can actually need instead of a fixed rectangle:
+# a disc of max range around the launch site plus a corridor around each
+# predicted trajectory, with a buffer that narrows as the zoom increases.
+# Shapes are built as convex polygons (discs and segment capsules) and
+# rasterized row by row in tile space, so each tile row costs one span.
+
+# Buffer radius per zoom; the detailed zooms are only needed close to the track
+BUFFERS_M = {12: 8000, 13: 4000, 14: 2000, 15: 1000, 16: 500, 17: 250, 18: 150}
+MAX_ZOOM = 19  # deepest zoom OSM serves
+ARC_STEPS = 8  # polygon vertices per half circle
+
+
+def read_track(path):
+    # Any CSV with lat/lon or Latitude/Longitude columns; 0,0 rows are fixes without a lock
+    points = []
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            row = {k.strip().lower(): v for k, v in row.items() if k}
+            try:
+                lat = float(row.get("lat") or row["latitude"])
+                lon = float(row.get("lon") or row["longitude"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if lat or lon:
+                points.append((lat, lon))
+    return points
+
+
+def simplify_track(points, spacing_m):
+    # Drop fixes closer than spacing_m to the last kept one. Every dropped fix is
+    # within spacing_m of a kept segment, so buffers grow by spacing_m to compensate.
+    if not points:
+        return []
+    kept = [points[0]]
+    m_per_deg_lat = math.pi * EARTH_RADIUS_M / 180.0
+    for lat, lon in points[1:]:
+        lat0, lon0 = kept[-1]
+        dn = (lat - lat0) * m_per_deg_lat
+        de = (lon - lon0) * m_per_deg_lat * math.cos(math.radians(lat0))
+        if math.hypot(dn, de) >= spacing_m:
+            kept.append((lat, lon))
+    if kept[-1] != points[-1]:
+        kept.append(points[-1])
+    return kept
+
+
+def capsule(a, b, radius_m):
+    # Convex polygon (lat, lon) enclosing every point within radius_m of segment a-b
+    lat0 = (a[0] + b[0]) / 2
+    m_per_deg_lat = math.pi * EARTH_RADIUS_M / 180.0
+    m_per_deg_lon = m_per_deg_lat * max(math.cos(math.radians(lat0)), 1e-6)
+    dn = (b[0] - a[0]) * m_per_deg_lat
+    de = (b[1] - a[1]) * m_per_deg_lon
+    heading = math.atan2(de, dn)
+    # Vertices on a slightly larger circle so the polygon contains the true one
+    r = radius_m / math.cos(math.pi / (2 * ARC_STEPS))
+    poly = []
+    for centre, start in ((b, heading - math.pi / 2), (a, heading + math.pi / 2)):
+        for i in range(ARC_STEPS + 1):
+            t = start + math.pi * i / ARC_STEPS
+            poly.append((centre[0] + r * math.cos(t) / m_per_deg_lat,
+                         centre[1] + r * math.sin(t) / m_per_deg_lon))
+    return poly
+
+
+def rasterize_convex(poly, zoom):
+    # Tiles touched by a convex (lat, lon) polygon: per tile row, the polygon's
+    # x extent inside that row's band is exactly one span of tiles.
+    n = 1 << zoom
+    pts = [latlon_to_tile_xy(lat, lon, zoom) for lat, lon in poly]
+    edges = list(zip(pts, pts[1:] + pts[:1]))
+    ys = [y for _, y in pts]
+    tiles = set()
+    for row in range(max(int(min(ys)), 0), min(int(max(ys)), n - 1) + 1):
+        xs = [x for x, y in pts if row <= y <= row + 1]
+        for (x1, y1), (x2, y2) in edges:
+            for yb in (row, row + 1):
+                if (y1 - yb) * (y2 - yb) < 0:
+                    xs.append(x1 + (yb - y1) * (x2 - x1) / (y2 - y1))
+        if not xs:
+            continue
+        x_lo = max(int(min(xs)), 0)
+        x_hi = min(max(math.ceil(max(xs)) - 1, x_lo), n - 1)
+        tiles.update((zoom, x, row) for x in range(x_lo, x_hi + 1))
+    return tiles
+
+
+def buffer_for(z, buffers=BUFFERS_M):
+    # Zooms outside the table: the buffer keeps halving per level inward and
+    # stays at the closest entry's size past the deep end
+    if z in buffers:
+        return buffers[z]
+    lo, hi = min(buffers), max(buffers)
+    if z < lo:
+        return buffers[lo] * 2 ** (lo - z)
+    return buffers[hi]
+
+
+def corridor_tiles(zooms, site=None, max_range_m=0, trajectories=(), buffers=BUFFERS_M):
+    # site: (lat, lon) launch point; trajectories: lists of (lat, lon) points
+    plan = []
+    for z in zooms:
+        buffer_m = buffer_for(z, buffers)
+        tiles = set()
+        if site is not None:
+            tiles |= rasterize_convex(capsule(site, site, max_range_m + buffer_m), z)
+        spacing = buffer_m / 4
+        for track in trajectories:
+            track = simplify_track(track, spacing)
+            for a, b in zip(track, track[1:] or track):
+                tiles |= rasterize_convex(capsule(a, b, buffer_m + spacing), z)
+        plan.extend(sorted(tiles))
+    return plan
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download only the tiles around a launch site and flight paths")
+    parser.add_argument("--site", nargs=2, type=float, metavar=("LAT", "LON"), help="launch site")
+    parser.add_argument("--range", type=float, default=0, dest="max_range", help="max range from the site in metres")
+    parser.add_argument("--trajectory", action="append", default=[], help="CSV with lat/lon columns (repeatable)")
+    parser.add_argument("--zooms", nargs=2, type=int, metavar=("MIN", "MAX"), default=(12, 18))
+    parser.add_argument("--out", default="tiles", help="tile directory or .mbtiles file")
+    parser.add_argument("--dry-run", action="store_true", help="print the plan without downloading")
+    parser.add_argument("--refresh", action="store_true",
+                        help="re-check stored tiles with conditional requests and rewrite changed ones "
+                             "(tile directories only)")
+    args = parser.parse_args()
+
+    tracks = [read_track(path) for path in args.trajectory]
+    if args.site is None and not any(tracks):
+        parser.error("give a --site and/or at least one --trajectory")
+    if not 0 <= args.zooms[0] <= args.zooms[1] <= MAX_ZOOM:
+        parser.error(f"--zooms needs 0 <= MIN <= MAX <= {MAX_ZOOM}")
+    if args.refresh and args.out.endswith(".mbtiles"):
+        # Refresh relies on the tile directory's manifest for the stored validators
+        parser.error("--refresh needs a tile directory")
+    zooms = range(args.zooms[0], args.zooms[1] + 1)
+    tiles = corridor_tiles(zooms, args.site, args.max_range, tracks)
+
+    # Compare against the bounding box of the same shapes at the same zooms
+    points = [p for track in tracks for p in track] + ([tuple(args.site)] if args.site else [])
+    lats, lons = [p[0] for p in points], [p[1] for p in points]
+    for z in zooms:
+        pad_deg = (args.max_range + buffer_for(z)) / (math.pi * EARTH_RADIUS_M / 180.0)
+        pad_lon = pad_deg / math.cos(math.radians(sum(lats) / len(lats)))
+        box = bbox_tiles(min(lats) - pad_deg, max(lats) + pad_deg, min(lons) - pad_lon, max(lons) + pad_lon, [z])
+        print(f"  Zoom {z}: {sum(1 for t in tiles if t[0] == z)} tiles (bounding box: {len(box)})")
+    print(f"Total: {len(tiles)} tiles")
+    if args.dry_run:
+        return
+
+    if args.out.endswith(".mbtiles"):
+        from tile_mbtiles import MBTilesWriter
+        writer = MBTilesWriter(args.out, batch_size=200)
+        try:
+            ok, failed = TileDownloader(writer).download(tiles)
+        finally:
+            writer.close()
+    else:
+        manifest = TileManifest(args.out)
+        manifest.load()
+        downloader = TileDownloader(TileDirectory(args.out), manifest=manifest)
+        if args.refresh:
+            changed, unchanged, failed = downloader.refresh(tiles)
+            print(f"Refreshed {args.out}: {changed} changed, {unchanged} unchanged, {failed} failed")
+            return
+        ok, failed = downloader.download(tiles)
+        manifest.report()
+    print(f"Downloaded {ok} tiles into {args.out}, {failed} failed")
+
+
+if __name__ == "__main__":
+    main()
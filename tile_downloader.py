@@ -0,0 +1,212 @@
+import math
+import os
+import random
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+from itertools import repeat
+from threading import Lock
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from tile_server import tile_hash
+
+OSM_URL = "https://tile.openstreetmap.org/{z}/{x}/{y}.png"
+HEADERS = {"User-Agent": "LiverpoolOfflineMap/1.0 (Educational)"}
+
+# OSM tile usage policy: identify the client, keep connections few and requests modest
+WORKERS = 2
+RATE_PER_SEC = 4.0
+BURST = 4
+RETRIES = 4
+BACKOFF_SEC = 1.0
+TIMEOUT_SEC = 10
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+def latlon_to_tile(lat, lon, zoom):
+    lat_rad = math.radians(lat)
+    n = 2.0 ** zoom
+    xtile = int((lon + 180.0) / 360.0 * n)
+    ytile = int((1.0 - math.log(math.tan(lat_rad) + 1 / math.cos(lat_rad)) / math.pi) / 2.0 * n)
+    return xtile, ytile
+
+
+def bbox_tiles(lat_min, lat_max, lon_min, lon_max, zooms):
+    tiles = []
+    for z in zooms:
+        x_min, y_max = latlon_to_tile(lat_min, lon_min, z)
+        x_max, y_min = latlon_to_tile(lat_max, lon_max, z)
+        x1, x2 = sorted([x_min, x_max])
+        y1, y2 = sorted([y_min, y_max])
+        tiles.extend((z, x, y) for x in range(x1, x2 + 1) for y in range(y1, y2 + 1))
+    return tiles
+
+
+class TokenBucket:
+    # Shared across workers: at most `rate` requests/s on average, `burst` at once
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.last = time.monotonic()
+        self._lock = Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class TileDownloader:
+    # Fetches tiles into a sink (anything with has() and put(), e.g. TileDirectory)
+    # over one keep-alive Session, with a bounded pool and a shared rate limit.
+    # Stored tiles are recorded in the manifest as they land, with the server's
+    # ETag/Last-Modified so refresh() can ask for changed tiles only.
+    def __init__(self, sink, url=OSM_URL, headers=HEADERS, workers=WORKERS,
+                 rate=RATE_PER_SEC, burst=BURST, retries=RETRIES, backoff=BACKOFF_SEC,
+                 manifest=None):
+        self.sink = sink
+        self.manifest = manifest
+        self.url = url
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.bucket = TokenBucket(rate, burst)
+
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def fetch(self, z, x, y, headers=None):
+        # The response (200, or 304 for a conditional request), or None on failure
+        url = self.url.format(z=z, x=x, y=y)
+        for attempt in range(self.retries + 1):
+            self.bucket.acquire()
+            try:
+                r = self.session.get(url, headers=headers, timeout=TIMEOUT_SEC)
+            except requests.RequestException as e:
+                error = str(e)
+            else:
+                if r.status_code in (200, 304):
+                    return r
+                if r.status_code not in RETRY_STATUS:
+                    print(f"Failed {url}: HTTP {r.status_code}")
+                    return None
+                error = f"HTTP {r.status_code}"
+                retry_after = r.headers.get("Retry-After")
+                if retry_after and retry_after.isdigit():
+                    time.sleep(int(retry_after))
+                    continue
+            if attempt < self.retries:
+                # Exponential backoff with jitter so workers do not retry in lockstep
+                time.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
+        print(f"Error downloading {url}: {error}")
+        return None
+
+    def download_one(self, tile):
+        z, x, y = tile
+        if self.sink.has(z, x, y):
+            # Tiles from before the manifest existed are recorded on first sight
+            if self.manifest is not None and self.manifest.is_missing(z, x, y):
+                self.manifest.record(z, x, y, self.sink.get(z, x, y))
+            return True
+        r = self.fetch(z, x, y)
+        if r is None:
+            return False
+        self.sink.put(z, x, y, r.content)
+        if self.manifest is not None:
+            self.manifest.record(z, x, y, r.content, r.headers.get("ETag"), r.headers.get("Last-Modified"))
+        return True
+
+    def download(self, tiles, progress_every=50):
+        tiles = list(tiles)
+        if self.manifest is not None:
+            self.manifest.plan(tiles)
+            tiles = self.manifest.missing_tiles()
+        total = len(tiles)
+        ok = 0
+        try:
+            with ThreadPoolExecutor(self.workers, thread_name_prefix="tile-dl") as pool:
+                for count, done in enumerate(pool.map(self.download_one, tiles), 1):
+                    ok += done
+                    if count % progress_every == 0 or count == total:
+                        print(f"  {count}/{total} tiles processed...")
+        finally:
+            if self.manifest is not None:
+                self.manifest.save()
+        return ok, total - ok
+
+    def refresh_one(self, tile, records):
+        # records: the manifest's (z, x, y) -> (size, hash, etag, last_modified)
+        z, x, y = tile
+        recorded = tile in records
+        _, digest, etag, modified = records.get(tile, (None, None, None, None))
+        stored = self.sink.has(z, x, y)
+        headers = {}
+        if stored:
+            # A conditional request only makes sense for bytes we still have
+            if etag:
+                headers["If-None-Match"] = etag
+            if modified:
+                headers["If-Modified-Since"] = modified
+            elif hasattr(self.sink, "tile_path"):
+                # Tiles saved without validators: the file's own mtime is the best guess
+                headers["If-Modified-Since"] = formatdate(os.path.getmtime(self.sink.tile_path(z, x, y)), usegmt=True)
+            if digest is None:
+                digest = tile_hash(self.sink.get(z, x, y))
+
+        r = self.fetch(z, x, y, headers)
+        if r is None:
+            return "failed"
+        if r.status_code == 304:
+            # Stored tiles without a record would stay missing after plan() and be
+            # downloaded again by every verify; record them with what the server said
+            if self.manifest is not None and not recorded:
+                self.manifest.record(z, x, y, self.sink.get(z, x, y),
+                                     r.headers.get("ETag", etag),
+                                     r.headers.get("Last-Modified", headers.get("If-Modified-Since")),
+                                     digest=digest)
+            return "unchanged"
+
+        new_digest = tile_hash(r.content)
+        validators = (r.headers.get("ETag"), r.headers.get("Last-Modified"))
+        if stored and new_digest == digest:
+            # Same bytes; keep the new validators so the next refresh can get a 304
+            if self.manifest is not None and (not recorded or validators != (etag, modified)):
+                self.manifest.record(z, x, y, r.content, *validators, digest=new_digest)
+            return "unchanged"
+        self.sink.put(z, x, y, r.content)
+        if self.manifest is not None:
+            self.manifest.record(z, x, y, r.content, *validators, digest=new_digest)
+        return "changed"
+
+    def refresh(self, tiles, progress_every=50):
+        # Conditional GET for every tile; only tiles whose bytes changed are rewritten
+        tiles = list(tiles)
+        records = {}
+        if self.manifest is not None:
+            records = self.manifest.records()
+            self.manifest.plan(tiles)
+        results = Counter()
+        try:
+            with ThreadPoolExecutor(self.workers, thread_name_prefix="tile-dl") as pool:
+                for count, result in enumerate(pool.map(self.refresh_one, tiles, repeat(records)), 1):
+                    results[result] += 1
+                    if count % progress_every == 0 or count == len(tiles):
+                        print(f"  {count}/{len(tiles)} tiles checked, {results['changed']} changed...")
+        finally:
+            if self.manifest is not None:
+                self.manifest.save()
+        return results["changed"], results["unchanged"], results["failed"]
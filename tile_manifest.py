@@ -0,0 +1,123 @@
+import json
+import os
+from threading import Lock
+from urllib.parse import quote, unquote
+
+from tile_server import tile_hash
+
+# A manifest is two files next to the tiles:
+#   manifest.json  summary: expected/present counts and the missing tiles per zoom
+#   manifest.log   append-only "z x y size hash etag last-modified" record per
+#                  stored tile; the HTTP validators are quoted, "-" when absent
+# Startup reads only the summary (plus any log lines written after its last
+# checkpoint); the full log is read only when planning a download.
+
+MANIFEST_FILE = "manifest.json"
+CHECKPOINT_EVERY = 200
+
+
+class TileManifest:
+    def __init__(self, tile_dir):
+        self.path = os.path.join(tile_dir, MANIFEST_FILE)
+        self.log_path = os.path.splitext(self.path)[0] + ".log"
+        self.expected = {}
+        self.present = {}
+        self.missing = {}
+        self._since_checkpoint = 0
+        self._lock = Lock()
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self):
+        if not self.exists():
+            return False
+        with open(self.path) as f:
+            summary = json.load(f)
+        self.expected = {int(z): n for z, n in summary["expected"].items()}
+        self.present = {int(z): n for z, n in summary["present"].items()}
+        self.missing = {int(z): {tuple(t) for t in tiles} for z, tiles in summary["missing"].items()}
+        # Records appended after the last checkpoint (e.g. an interrupted download)
+        for z, x, y, *_ in self._read_log(summary.get("log_offset", 0)):
+            self._mark_present(z, x, y)
+        return True
+
+    def records(self):
+        # (z, x, y) -> (size, hash, etag, last_modified); later records win
+        return {(z, x, y): rest for z, x, y, *rest in self._read_log(0)}
+
+    def _read_log(self, offset):
+        if not os.path.exists(self.log_path):
+            return
+        with open(self.log_path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                parts = line.decode().split()
+                if len(parts) == 5:
+                    parts += ["-", "-"]
+                if len(parts) == 7:
+                    z, x, y, size = (int(v) for v in parts[:4])
+                    etag, modified = (None if v == "-" else unquote(v) for v in parts[5:])
+                    yield z, x, y, size, parts[4], etag, modified
+
+    def plan(self, tiles):
+        # Expected set for a download; anything not yet recorded becomes missing
+        recorded = self.records()
+        with self._lock:
+            self.expected, self.present, self.missing = {}, {}, {}
+            for z, x, y in tiles:
+                self.expected[z] = self.expected.get(z, 0) + 1
+                if (z, x, y) in recorded:
+                    self.present[z] = self.present.get(z, 0) + 1
+                else:
+                    self.missing.setdefault(z, set()).add((x, y))
+            self._save()
+
+    def is_missing(self, z, x, y):
+        return (x, y) in self.missing.get(z, ())
+
+    def missing_tiles(self):
+        return [(z, x, y) for z, tiles in self.missing.items() for x, y in tiles]
+
+    def is_complete(self):
+        return bool(self.expected) and not any(self.missing.values())
+
+    def record(self, z, x, y, data, etag=None, last_modified=None, digest=None):
+        validators = " ".join(quote(v, safe="") if v else "-" for v in (etag, last_modified))
+        line = f"{z} {x} {y} {len(data)} {digest or tile_hash(data)} {validators}\n"
+        with self._lock:
+            with open(self.log_path, "a") as f:
+                f.write(line)
+            self._mark_present(z, x, y)
+            self._since_checkpoint += 1
+            if self._since_checkpoint >= CHECKPOINT_EVERY:
+                self._save()
+
+    def _mark_present(self, z, x, y):
+        tiles = self.missing.get(z)
+        if tiles and (x, y) in tiles:
+            tiles.discard((x, y))
+            self.present[z] = self.present.get(z, 0) + 1
+
+    def save(self):
+        with self._lock:
+            self._save()
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        summary = {
+            "expected": self.expected,
+            "present": self.present,
+            "missing": {z: sorted(tiles) for z, tiles in self.missing.items()},
+            "log_offset": os.path.getsize(self.log_path) if os.path.exists(self.log_path) else 0
+        }
+        tmp = self.path + ".part"
+        with open(tmp, "w") as f:
+            json.dump(summary, f, separators=(",", ":"))
+        os.replace(tmp, self.path)
+        self._since_checkpoint = 0
+
+    def report(self):
+        for z in sorted(self.expected):
+            print(f"  Zoom {z}: {self.present.get(z, 0)}/{self.expected[z]} tiles, "
+                  f"{len(self.missing.get(z, ()))} missing")
@@ -0,0 +1,226 @@
+import argparse
+import os
+import sqlite3
+import time
+from itertools import islice
+from threading import Lock
+
+from tile_archive import scan_tiles
+from tile_downloader import TileDownloader, bbox_tiles
+from tile_server import tile_hash
+
+# Builds the liverpool.mbtiles that MBTilesStore serves, either by importing an
+# existing tiles/ directory or by downloading straight into the database.
+# Rows are written in large executemany() transactions with the database in WAL
+# mode; tile_row is stored in TMS order as the MBTiles spec requires.
+# Tiles are stored as the bytes the server sent, deduplicated by content hash:
+# map (z, x, y) -> tile_id, images tile_id -> tile_data, and a "tiles" view
+# joining the two, so readers see an ordinary MBTiles file.
+
+MBTILES_FILE = "liverpool.mbtiles"
+BATCH_SIZE = 2000
+DOWNLOAD_BATCH_SIZE = 200
+
+LAT_MIN, LAT_MAX = 53.38, 53.45
+LON_MIN, LON_MAX = -3.05, -2.90
+
+MBTILES_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT)",
+    "CREATE TABLE IF NOT EXISTS map (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_id TEXT)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS map_index ON map (zoom_level, tile_column, tile_row)",
+    "CREATE TABLE IF NOT EXISTS images (tile_id TEXT PRIMARY KEY, tile_data BLOB)",
+    """CREATE VIEW IF NOT EXISTS tiles AS
+        SELECT map.zoom_level AS zoom_level, map.tile_column AS tile_column,
+               map.tile_row AS tile_row, images.tile_data AS tile_data
+        FROM map JOIN images ON images.tile_id = map.tile_id""",
+)
+MAP_INSERT = "INSERT OR REPLACE INTO map VALUES (?, ?, ?, ?)"
+IMAGE_INSERT = "INSERT OR IGNORE INTO images VALUES (?, ?)"
+TILE_KEYS_QUERY = "SELECT zoom_level, tile_column, tile_row FROM map"
+PRUNE_IMAGES = "DELETE FROM images WHERE tile_id NOT IN (SELECT tile_id FROM map)"
+TILE_QUERY = "SELECT tile_data FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?"
+
+
+class MBTilesWriter:
+    # Tile sink over an MBTiles file (has/get/put like TileDirectory), so it can
+    # be handed to TileDownloader. Puts are buffered and committed in batches.
+    def __init__(self, path, name="Liverpool", batch_size=BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        kind = self.conn.execute("SELECT type FROM sqlite_master WHERE name='tiles'").fetchone()
+        if kind is not None and kind[0] == "table":
+            self._dedupe_tiles_table()
+        for stmt in MBTILES_SCHEMA:
+            self.conn.execute(stmt)
+        self.conn.execute("INSERT OR IGNORE INTO metadata VALUES ('name', ?)", (name,))
+        self.conn.execute("INSERT OR IGNORE INTO metadata VALUES ('format', 'png')")
+        self.conn.commit()
+
+        self._keys = {(z, x, (1 << z) - 1 - row) for z, x, row in self.conn.execute(TILE_KEYS_QUERY)}
+        self._hashes = {row[0] for row in self.conn.execute("SELECT tile_id FROM images")}
+        self._pending = []
+        self._images = []
+        self._lock = Lock()
+        self.stored = 0
+        self.duplicates = 0
+
+    def _dedupe_tiles_table(self):
+        # Files from before deduplication (or other tools) keep a plain tiles table.
+        # One transaction, DDL included: an interrupted conversion rolls back to
+        # the plain table instead of leaving a file with no tiles at all.
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute("ALTER TABLE tiles RENAME TO tiles_plain")
+            for stmt in MBTILES_SCHEMA:
+                self.conn.execute(stmt)
+            rows = self.conn.execute("SELECT zoom_level, tile_column, tile_row, tile_data FROM tiles_plain")
+            while True:
+                batch = rows.fetchmany(BATCH_SIZE)
+                if not batch:
+                    break
+                digests = [tile_hash(data) for _, _, _, data in batch]
+                self.conn.executemany(IMAGE_INSERT, ((d, row[3]) for d, row in zip(digests, batch)))
+                self.conn.executemany(MAP_INSERT, ((z, x, y, d) for (z, x, y, _), d in zip(batch, digests)))
+            self.conn.execute("DROP TABLE tiles_plain")
+        except BaseException:
+            self.conn.rollback()
+            raise
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def has(self, z, x, y):
+        return (z, x, y) in self._keys
+
+    def get(self, z, x, y):
+        with self._lock:
+            self._flush()
+            row = self.conn.execute(TILE_QUERY, (z, x, (1 << z) - 1 - y)).fetchone()
+        return row[0] if row is not None else None
+
+    def put(self, z, x, y, data):
+        with self._lock:
+            self._add(z, x, y, data)
+            if len(self._pending) >= self.batch_size:
+                self._flush()
+
+    def put_many(self, rows):
+        # rows of (z, x, y, data) in XYZ order; one transaction per call
+        with self._lock:
+            for z, x, y, data in rows:
+                self._add(z, x, y, data)
+            self._flush()
+
+    def _add(self, z, x, y, data):
+        digest = tile_hash(data)
+        if digest in self._hashes:
+            self.duplicates += 1
+        else:
+            self._hashes.add(digest)
+            self._images.append((digest, data))
+        self._pending.append((z, x, (1 << z) - 1 - y, digest))
+        self._keys.add((z, x, y))
+        self.stored += 1
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        with self.conn:
+            self.conn.executemany(IMAGE_INSERT, self._images)
+            self.conn.executemany(MAP_INSERT, self._pending)
+        self._images = []
+        self._pending = []
+
+    def close(self, bounds=None):
+        with self._lock:
+            self._flush()
+            zooms = self.conn.execute("SELECT MIN(zoom_level), MAX(zoom_level) FROM map").fetchone()
+            meta = {}
+            if zooms[0] is not None:
+                meta["minzoom"], meta["maxzoom"] = str(zooms[0]), str(zooms[1])
+            if bounds is not None:
+                meta["bounds"] = ",".join(str(v) for v in bounds)
+            with self.conn:
+                self.conn.executemany("INSERT OR REPLACE INTO metadata VALUES (?, ?)", meta.items())
+                # Images no longer referenced after a tile was replaced
+                self.conn.execute(PRUNE_IMAGES)
+            # Back to a single-file database so MBTilesStore can open it read-only
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self.conn.execute("PRAGMA journal_mode = DELETE")
+            self.conn.close()
+
+
+def read_tiles(root):
+    for z, x, y, path in scan_tiles(root):
+        with open(path, "rb") as f:
+            yield z, x, y, f.read()
+
+
+def import_tiles(tile_dir, mbtiles, batch_size=BATCH_SIZE):
+    # Bulk import of tiles/{z}/{x}/{y}.png or tiles/{z}_{x}_{y}.png
+    writer = MBTilesWriter(mbtiles, batch_size=batch_size)
+    tiles = read_tiles(tile_dir)
+    count = 0
+    t0 = time.perf_counter()
+    try:
+        while True:
+            batch = list(islice(tiles, batch_size))
+            if not batch:
+                break
+            writer.put_many(batch)
+            count += len(batch)
+            rate = count / max(time.perf_counter() - t0, 1e-9)
+            print(f"  {count} tiles imported, {writer.duplicates} duplicates ({rate:.0f} tiles/s)...")
+    finally:
+        writer.close()
+    return count, count - writer.duplicates
+
+
+def download_tiles(mbtiles, lat_min=LAT_MIN, lat_max=LAT_MAX, lon_min=LON_MIN, lon_max=LON_MAX,
+                   zooms=range(12, 19)):
+    tiles = bbox_tiles(lat_min, lat_max, lon_min, lon_max, zooms)
+    writer = MBTilesWriter(mbtiles, batch_size=DOWNLOAD_BATCH_SIZE)
+    try:
+        ok, failed = TileDownloader(writer).download(tiles)
+    finally:
+        writer.close(bounds=(lon_min, lat_min, lon_max, lat_max))
+    return ok, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build an MBTiles file from a tile directory or the tile server")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    imp = sub.add_parser("import", help="import an existing tile directory")
+    imp.add_argument("tile_dir", help="tiles/{z}/{x}/{y}.png or tiles/{z}_{x}_{y}.png")
+    imp.add_argument("mbtiles", nargs="?", default=MBTILES_FILE, help="output MBTiles path")
+
+    dl = sub.add_parser("download", help="download the map area straight into MBTiles")
+    dl.add_argument("mbtiles", nargs="?", default=MBTILES_FILE, help="output MBTiles path")
+    dl.add_argument("--bbox", nargs=4, type=float, metavar=("LAT_MIN", "LAT_MAX", "LON_MIN", "LON_MAX"),
+                    default=(LAT_MIN, LAT_MAX, LON_MIN, LON_MAX))
+    dl.add_argument("--zooms", nargs=2, type=int, metavar=("MIN", "MAX"), default=(12, 18))
+    args = parser.parse_args()
+
+    if args.command == "import":
+        count, unique = import_tiles(args.tile_dir, args.mbtiles)
+        print(f"Imported {count} tiles ({unique} unique) into {args.mbtiles}: "
+              f"{os.path.getsize(args.mbtiles) / 1e6:.1f} MB")
+    else:
+        ok, failed = download_tiles(args.mbtiles, *args.bbox, zooms=range(args.zooms[0], args.zooms[1] + 1))
+        print(f"Downloaded {ok} tiles into {args.mbtiles}, {failed} failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import math
+import os
+import time
+from collections import OrderedDict
+from threading import Condition, Thread, get_native_id
+
+EARTH_RADIUS_M = 6371000.0
+LOOKAHEAD_SEC = (0, 2, 5, 10, 20)
+RADIUS_TILES = 1
+DUTY_CYCLE = 0.2  # fraction of one core the worker may use
+MAX_TILES_PER_SEC = 50
+WARMED_MEMORY = 4096
+
+
+def latlon_to_tile_xy(lat, lon, zoom):
+    lat = max(min(lat, 85.0511), -85.0511)
+    n = 2.0 ** zoom
+    x = (lon + 180.0) / 360.0 * n
+    lat_rad = math.radians(lat)
+    y = (1.0 - math.log(math.tan(lat_rad) + 1 / math.cos(lat_rad)) / math.pi) / 2.0 * n
+    return x, y
+
+
+def plan_tiles(lat, lon, v_north, v_east, zoom, lookahead=LOOKAHEAD_SEC, radius=RADIUS_TILES):
+    # Tiles around the current and extrapolated positions, nearest-in-time first,
+    # at the viewed zoom and the next one in.
+    m_per_deg_lat = math.pi * EARTH_RADIUS_M / 180.0
+    m_per_deg_lon = m_per_deg_lat * max(math.cos(math.radians(lat)), 1e-6)
+    seen = set()
+    plan = []
+    for dt in lookahead:
+        p_lat = lat + v_north * dt / m_per_deg_lat
+        p_lon = lon + v_east * dt / m_per_deg_lon
+        for z in (zoom, zoom + 1):
+            fx, fy = latlon_to_tile_xy(p_lat, p_lon, z)
+            n = 1 << z
+            for dx in range(-radius, radius + 1):
+                for dy in range(-radius, radius + 1):
+                    key = (z, int(fx) + dx, int(fy) + dy)
+                    if key not in seen and 0 <= key[1] < n and 0 <= key[2] < n:
+                        seen.add(key)
+                        plan.append(key)
+    return plan
+
+
+class TilePrefetcher:
+    # Warms the tile server's store ahead of the vehicle on a low-priority thread.
+    # Stores are warmed through prefetch() when they have one, otherwise get().
+    def __init__(self, store, zoom=15, max_zoom=18, duty_cycle=DUTY_CYCLE,
+                 max_tiles_per_sec=MAX_TILES_PER_SEC):
+        self.store = store
+        self.zoom = zoom
+        self.max_zoom = max_zoom
+        self.duty_cycle = duty_cycle
+        self.max_tiles_per_sec = max_tiles_per_sec
+        self.warmed = 0
+
+        self._fix = None
+        self._velocity = (0.0, 0.0)
+        self._plan = []
+        self._done = OrderedDict()
+        self._cond = Condition()
+        self._running = True
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def set_zoom(self, zoom):
+        if zoom is None:
+            return
+        with self._cond:
+            self.zoom = min(int(zoom), self.max_zoom)
+            self._replan()
+
+    def feed(self, t, lat, lon, speed=None, heading=None):
+        # speed in m/s and heading in degrees from north; derived from fixes when absent
+        with self._cond:
+            if speed is not None and heading is not None:
+                h = math.radians(heading)
+                self._velocity = (speed * math.cos(h), speed * math.sin(h))
+            elif self._fix is not None and t > self._fix[0]:
+                t0, lat0, lon0 = self._fix
+                m_per_deg_lat = math.pi * EARTH_RADIUS_M / 180.0
+                m_per_deg_lon = m_per_deg_lat * max(math.cos(math.radians(lat)), 1e-6)
+                v_n = (lat - lat0) * m_per_deg_lat / (t - t0)
+                v_e = (lon - lon0) * m_per_deg_lon / (t - t0)
+                # Light smoothing so one noisy GPS fix does not swing the look-ahead
+                self._velocity = (0.7 * v_n + 0.3 * self._velocity[0],
+                                  0.7 * v_e + 0.3 * self._velocity[1])
+            self._fix = (t, lat, lon)
+            self._replan()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+
+    def _replan(self):
+        if self._fix is None:
+            return
+        _, lat, lon = self._fix
+        z = min(self.zoom, self.max_zoom - 1)
+        plan = plan_tiles(lat, lon, self._velocity[0], self._velocity[1], z)
+        self._plan = [k for k in reversed(plan) if k not in self._done]
+        self._cond.notify()
+
+    def _run(self):
+        try:
+            # Lowest scheduling priority for this thread only (Linux)
+            os.setpriority(os.PRIO_PROCESS, get_native_id(), 19)
+        except (AttributeError, OSError):
+            pass
+
+        while True:
+            with self._cond:
+                while self._running and not self._plan:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                key = self._plan.pop()
+
+            t0 = time.perf_counter()
+            warm = getattr(self.store, "prefetch", None) or self.store.get
+            try:
+                warm(*key)
+            except Exception:
+                pass
+            busy = time.perf_counter() - t0
+
+            with self._cond:
+                self._done[key] = True
+                if len(self._done) > WARMED_MEMORY:
+                    self._done.popitem(last=False)
+                self.warmed += 1
+
+            # Sleep long enough to hold the duty cycle and the tile rate cap
+            time.sleep(max(busy * (1 - self.duty_cycle) / self.duty_cycle,
+                           1.0 / self.max_tiles_per_sec - busy))
@@ -0,0 +1,209 @@
+import argparse
+import io
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from tile_archive import scan_tiles
+from tile_server import tile_content_type, tile_hash
+
+# Offline pass that shrinks a tile directory or MBTiles file in place:
+#   png      lossless re-encode with zlib at its highest effort
+#   palette  lossy: quantized to a 256-colour palette PNG, alpha kept
+#            (OSM raster tiles rarely use more colours)
+#   webp     WebP, lossless unless --quality is given
+# A tile is only rewritten when the new encoding is smaller. Files keep their
+# .png names; the servers pick the Content-Type from the tile's first bytes.
+
+FORMATS = ("png", "palette", "webp")
+CHUNK_SIZE = 64
+
+
+def decode_time(data):
+    from PIL import Image
+
+    t0 = time.perf_counter()
+    Image.open(io.BytesIO(data)).load()
+    return time.perf_counter() - t0
+
+
+def recompress(data, fmt, quality=None):
+    from PIL import Image
+
+    img = Image.open(io.BytesIO(data))
+    out = io.BytesIO()
+    if fmt == "webp":
+        img = img.convert("RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB")
+        if quality is None:
+            img.save(out, format="WEBP", lossless=True, method=6)
+        else:
+            img.save(out, format="WEBP", quality=quality, method=6)
+    elif fmt == "palette":
+        if img.mode != "P" and ("A" in img.getbands() or "transparency" in img.info):
+            # Median cut only takes RGB; fast octree keeps alpha in the palette
+            img = img.convert("RGBA").quantize(colors=256, method=Image.Quantize.FASTOCTREE)
+        elif img.mode != "P":
+            img = img.convert("RGB").quantize(colors=256, method=Image.Quantize.MEDIANCUT)
+        img.save(out, format="PNG", optimize=True)
+    else:
+        img.save(out, format="PNG", optimize=True, compress_level=9)
+    return out.getvalue()
+
+
+def recompress_tile(data, fmt, quality=None):
+    # (new data or None when not smaller, old size, new size, old decode s, new decode s)
+    new = recompress(data, fmt, quality)
+    old_decode = decode_time(data)
+    if len(new) >= len(data):
+        return None, len(data), len(data), old_decode, old_decode
+    return new, len(data), len(new), old_decode, decode_time(new)
+
+
+def recompress_file(path, fmt, quality=None):
+    with open(path, "rb") as f:
+        data = f.read()
+    new, *stats = recompress_tile(data, fmt, quality)
+    if new is not None:
+        tmp = path + ".part"
+        with open(tmp, "wb") as f:
+            f.write(new)
+        os.replace(tmp, path)
+    return stats
+
+
+def recompress_row(row, fmt, quality=None):
+    key, data = row
+    new, *stats = recompress_tile(data, fmt, quality)
+    return key, new, stats
+
+
+class Report:
+    def __init__(self):
+        self.count = 0
+        self.rewritten = 0
+        self.old_bytes = 0
+        self.new_bytes = 0
+        self.old_decode = 0.0
+        self.new_decode = 0.0
+        self.webp = None  # tiles stored as WebP afterwards, for MBTiles metadata
+
+    def add(self, old_size, new_size, old_decode, new_decode):
+        self.count += 1
+        self.rewritten += new_size < old_size
+        self.old_bytes += old_size
+        self.new_bytes += new_size
+        self.old_decode += old_decode
+        self.new_decode += new_decode
+
+    def progress(self):
+        print(f"  {self.count} tiles, {self.rewritten} rewritten, "
+              f"{self.old_bytes / 1e6:.1f} MB -> {self.new_bytes / 1e6:.1f} MB...")
+
+    def summary(self):
+        saved = 1 - self.new_bytes / self.old_bytes if self.old_bytes else 0
+        n = max(self.count, 1)
+        print(f"{self.count} tiles, {self.rewritten} rewritten")
+        print(f"  size:   {self.old_bytes / 1e6:.1f} MB -> {self.new_bytes / 1e6:.1f} MB ({saved:.0%} smaller)")
+        print(f"  decode: {self.old_decode / n * 1000:.3f} ms -> {self.new_decode / n * 1000:.3f} ms per tile")
+        if self.webp is not None:
+            print(f"  webp:   {self.webp}/{self.count} tiles, metadata format "
+                  f"{'webp' if self.webp == self.count else 'png (mixed PNG/WebP)'}")
+
+
+def recompress_directory(root, fmt, quality=None, workers=None, progress_every=1000):
+    report = Report()
+    paths = [path for _, _, _, path in scan_tiles(root)]
+    with ProcessPoolExecutor(workers) as pool:
+        results = pool.map(recompress_file, paths, [fmt] * len(paths), [quality] * len(paths),
+                           chunksize=CHUNK_SIZE)
+        for stats in results:
+            report.add(*stats)
+            if report.count % progress_every == 0:
+                report.progress()
+    return report
+
+
+def rekey_images(conn, updates):
+    # Deduplicated files (tile_mbtiles) key each image by the hash of its bytes,
+    # so a rewritten image gets the hash of its new bytes and the map follows.
+    # When the new bytes already exist as another image, the two are merged.
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS rekey (old TEXT PRIMARY KEY, new TEXT)")
+    conn.execute("DELETE FROM rekey")
+    for rowid, old_id, data in updates:
+        new_id = tile_hash(data)
+        if new_id == old_id:
+            continue
+        conn.execute("INSERT OR REPLACE INTO rekey VALUES (?, ?)", (old_id, new_id))
+        if conn.execute("SELECT 1 FROM images WHERE tile_id=?", (new_id,)).fetchone():
+            conn.execute("DELETE FROM images WHERE rowid=?", (rowid,))
+        else:
+            conn.execute("UPDATE images SET tile_id=?, tile_data=? WHERE rowid=?", (new_id, data, rowid))
+    conn.execute("""UPDATE map SET tile_id = (SELECT new FROM rekey WHERE old = map.tile_id)
+        WHERE tile_id IN (SELECT old FROM rekey)""")
+
+
+def recompress_mbtiles(path, fmt, quality=None, workers=None, batch_size=256):
+    # Rows are read one batch at a time in rowid order, so memory stays at one
+    # batch of tiles however large the file is
+    report = Report()
+    conn = sqlite3.connect(path)
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    table, key = ("images", "tile_id") if "images" in tables else ("tiles", "NULL")
+    last = 0
+    webp = 0
+    with ProcessPoolExecutor(workers) as pool:
+        while True:
+            batch = conn.execute(f"SELECT rowid, {key}, tile_data FROM {table} WHERE rowid > ? "
+                                 f"ORDER BY rowid LIMIT ?", (last, batch_size)).fetchall()
+            if not batch:
+                break
+            last = batch[-1][0]
+            keys = {rowid: tile_id for rowid, tile_id, _ in batch}
+            rows = [(rowid, data) for rowid, _, data in batch]
+            del batch
+            updates = []
+            results = pool.map(recompress_row, rows, [fmt] * len(rows), [quality] * len(rows),
+                               chunksize=CHUNK_SIZE)
+            for (_, data), (rowid, new, stats) in zip(rows, results):
+                report.add(*stats)
+                if new is not None:
+                    updates.append((rowid, keys[rowid], new))
+                webp += tile_content_type(data if new is None else new) == "image/webp"
+            with conn:
+                if table == "images":
+                    rekey_images(conn, updates)
+                else:
+                    conn.executemany("UPDATE tiles SET tile_data=? WHERE rowid=?",
+                                     ((new, rowid) for rowid, _, new in updates))
+            report.progress()
+    if fmt == "webp":
+        # Only smaller encodings are kept, so the file may end up mixed; MBTiles
+        # readers trust 'format', which can only say webp when every tile is
+        report.webp = webp
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO metadata VALUES ('format', ?)",
+                         ("webp" if webp == report.count else "png",))
+    conn.execute("VACUUM")
+    conn.close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shrink offline tiles in place on a process pool")
+    parser.add_argument("source", help="tile directory or .mbtiles file")
+    parser.add_argument("--format", choices=FORMATS, default="png",
+                        help="png: lossless PNG; palette: lossy 256-colour PNG; webp: WebP, lossless unless --quality")
+    parser.add_argument("--quality", type=int, help="lossy WebP quality (default: lossless)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    if args.source.endswith(".mbtiles"):
+        report = recompress_mbtiles(args.source, args.format, args.quality, args.workers)
+    else:
+        report = recompress_directory(args.source, args.format, args.quality, args.workers)
+    report.summary()
+
+
+if __name__ == "__main__":
+    main()
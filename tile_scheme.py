@@ -0,0 +1,144 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5.QtCore import QBuffer, QIODevice, QTimer, Qt, pyqtSignal
+from PyQt5.QtWidgets import QLabel
+from PyQt5.QtWebEngineCore import (QWebEngineUrlRequestJob, QWebEngineUrlScheme,
+                                   QWebEngineUrlSchemeHandler)
+from PyQt5.QtWebEngineWidgets import QWebEngineProfile
+
+from tile_server import METRICS, tile_content_type
+
+# Tiles are requested as tiles://local/{z}/{x}/{y}.png and answered inside the
+# Qt process from the same stores the HTTP server uses; no socket, no port.
+TILE_SCHEME = b"tiles"
+LOADER_THREADS = 4
+OVERLAY_INTERVAL_MS = 1000
+
+
+def register_tile_scheme():
+    # Must run before the QApplication is created
+    scheme = QWebEngineUrlScheme(TILE_SCHEME)
+    scheme.setSyntax(QWebEngineUrlScheme.Syntax.Host)
+    scheme.setFlags(QWebEngineUrlScheme.SecureScheme | QWebEngineUrlScheme.CorsEnabled)
+    QWebEngineUrlScheme.registerScheme(scheme)
+
+
+def parse_tile_path(path):
+    parts = path.strip("/").split("/")
+    if len(parts) != 3:
+        return None
+    try:
+        return int(parts[0]), int(parts[1]), int(parts[2].split(".")[0])
+    except ValueError:
+        return None
+
+
+class TileSchemeHandler(QWebEngineUrlSchemeHandler):
+    # Loads run on a small thread pool; replies are queued back to the GUI thread
+    tile_loaded = pyqtSignal(object, object)
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.pool = ThreadPoolExecutor(LOADER_THREADS, thread_name_prefix="tiles")
+        self.pending = set()
+        self.tile_loaded.connect(self.reply)
+
+    def requestStarted(self, job):
+        path = job.requestUrl().path()
+        if path.rstrip("/") == "/metrics":
+            self.send(job, json.dumps(METRICS.snapshot(self.store), indent=1).encode(), b"application/json")
+            return
+
+        key = parse_tile_path(path)
+        if key is None:
+            METRICS.count("bad_request")
+            job.fail(QWebEngineUrlRequestJob.UrlInvalid)
+            return
+        METRICS.count("requests")
+
+        # Tiles already in memory are answered without a thread hop; peek() never
+        # loads, so a tile evicted meanwhile still goes to the pool
+        peek = getattr(self.store, "peek", None)
+        if peek is not None:
+            t0 = time.perf_counter()
+            data = peek(key)
+            if data is not None:
+                METRICS.observe("lookup", time.perf_counter() - t0)
+                self.pending.add(job)
+                self.reply(job, data)
+                return
+
+        self.pending.add(job)
+        job.destroyed.connect(lambda *_: self.pending.discard(job))
+        self.pool.submit(self.load, job, key)
+
+    def load(self, job, key):
+        METRICS.take_inner()
+        t0 = time.perf_counter()
+        try:
+            data = self.store.get(*key)
+        except Exception:
+            data = None
+        METRICS.observe("lookup", time.perf_counter() - t0 - METRICS.take_inner())
+        self.tile_loaded.emit(job, data)
+
+    def reply(self, job, data):
+        # The page may have dropped the request (pan/zoom) while it was loading
+        if job not in self.pending:
+            METRICS.count("cancelled")
+            return
+        self.pending.discard(job)
+        if data is None:
+            METRICS.count("not_found")
+            job.fail(QWebEngineUrlRequestJob.UrlNotFound)
+            return
+        t0 = time.perf_counter()
+        self.send(job, data, tile_content_type(data).encode())
+        METRICS.observe("write", time.perf_counter() - t0)
+
+    def send(self, job, data, content_type):
+        buf = QBuffer(job)
+        buf.setData(bytes(data))
+        buf.open(QIODevice.ReadOnly)
+        job.reply(content_type, buf)
+
+
+def install_tile_scheme(store, profile=None):
+    # Keep the returned handler alive for as long as the page is shown
+    profile = profile or QWebEngineProfile.defaultProfile()
+    handler = TileSchemeHandler(store, profile)
+    profile.installUrlSchemeHandler(TILE_SCHEME, handler)
+    return handler
+
+
+class MetricsOverlay(QLabel):
+    # Small read-out over the map: request counts, hit ratio and p99 per stage
+    def __init__(self, parent, store=None):
+        super().__init__(parent)
+        self.store = store
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.setStyleSheet("background:rgba(33,43,88,200);color:white;font:9pt monospace;padding:4px;")
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(OVERLAY_INTERVAL_MS)
+        self.refresh()
+        self.show()
+
+    def refresh(self):
+        snap = METRICS.snapshot(self.store)
+        c = snap["counters"]
+        lines = [f"req {c.get('requests', 0)}  404 {c.get('not_found', 0)}  fallback {c.get('fallbacks', 0)}"]
+        cache = snap.get("cache")
+        if cache:
+            lines.append(f"cache hit {cache['hit_ratio']:.0%}  {cache['bytes'] / 1e6:.1f} MB")
+        for stage in ("lookup", "resample", "write"):
+            t = snap["timings"].get(stage)
+            if t:
+                lines.append(f"{stage:<8} p50 {t['p50_ms']:g} ms  p99 {t['p99_ms']:g} ms")
+        self.setText("\n".join(lines))
+        self.adjustSize()
+        self.move(self.parent().width() - self.width() - 8, 8)
+        self.raise_()
@@ -0,0 +1,603 @@
+import hashlib
+import io
+import json
+import os
+import pathlib
+import sqlite3
+import time
+from bisect import bisect_left
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager, nullcontext
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from threading import Lock, Thread, local
+
+HOST = "localhost"
+PORT = 5000
+KEEPALIVE_TIMEOUT_SEC = 30
+TILE_MAX_AGE_SEC = 7 * 24 * 3600
+MMAP_SIZE = 256 * 1024 * 1024
+CACHE_BYTES = 64 * 1024 * 1024
+TILE_SIZE = 256
+MAX_UNDERZOOM_LEVELS = 2
+MAX_OVERZOOM_LEVELS = 4  # a 16 px crop of the ancestor; deeper is blur, and 0 px past 8
+
+TILE_QUERY = "SELECT tile_data FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?"
+COVERAGE_BOUNDS_QUERY = """SELECT zoom_level, MIN(tile_column), MAX(tile_column), MIN(tile_row), MAX(tile_row)
+    FROM tiles GROUP BY zoom_level"""
+COVERAGE_TILES_QUERY = "SELECT zoom_level, tile_column, tile_row FROM tiles"
+
+DERIVED_SCHEMA = """CREATE TABLE IF NOT EXISTS derived (
+    zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB,
+    PRIMARY KEY (zoom_level, tile_column, tile_row))"""
+DERIVED_QUERY = "SELECT tile_data FROM derived WHERE zoom_level=? AND tile_column=? AND tile_row=?"
+DERIVED_INSERT = "INSERT OR REPLACE INTO derived VALUES (?, ?, ?, ?)"
+
+# Histogram bucket upper bounds in milliseconds
+LATENCY_BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 1000)
+
+# ---------------- METRICS ----------------
+
+class TileMetrics:
+    # Counters and per-stage latency histograms shared by every store and server
+    # in the process. Stages: lookup, resample, write, total.
+    def __init__(self):
+        self.started = time.time()
+        self._counters = {}
+        self._hist = {}
+        self._lock = Lock()
+        self._req = local()
+
+    def count(self, name, n=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def observe(self, stage, seconds):
+        ms = seconds * 1000.0
+        with self._lock:
+            h = self._hist.get(stage)
+            if h is None:
+                h = self._hist[stage] = {"buckets": [0] * (len(LATENCY_BUCKETS_MS) + 1), "count": 0, "sum": 0.0}
+            h["buckets"][bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+            h["count"] += 1
+            h["sum"] += ms
+
+    @contextmanager
+    def stage(self, name):
+        # Time spent here is also subtracted from the enclosing request's lookup time
+        depth = getattr(self._req, "depth", 0)
+        self._req.depth = depth + 1
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            dt = time.perf_counter() - t0
+            self._req.depth = depth
+            if depth == 0:
+                self.observe(name, dt)
+                self._req.inner = getattr(self._req, "inner", 0.0) + dt
+
+    def take_inner(self):
+        inner = getattr(self._req, "inner", 0.0)
+        self._req.inner = 0.0
+        return inner
+
+    def snapshot(self, store=None):
+        with self._lock:
+            timings = {}
+            for stage, h in self._hist.items():
+                timings[stage] = {
+                    "count": h["count"],
+                    "mean_ms": h["sum"] / h["count"],
+                    "p50_ms": self._percentile(h, 0.50),
+                    "p90_ms": self._percentile(h, 0.90),
+                    "p99_ms": self._percentile(h, 0.99),
+                    "buckets_ms": {str(le): n for le, n in zip(LATENCY_BUCKETS_MS + ("inf",), h["buckets"])}
+                }
+            snap = {
+                "uptime_sec": time.time() - self.started,
+                "counters": dict(self._counters),
+                "timings": timings
+            }
+        stats = getattr(store, "stats", None)
+        if stats is not None:
+            snap["cache"] = stats()
+        return snap
+
+    @staticmethod
+    def _percentile(h, q):
+        # Upper bound of the bucket holding the q-th request
+        target = q * h["count"]
+        seen = 0
+        for le, n in zip(LATENCY_BUCKETS_MS, h["buckets"]):
+            seen += n
+            if seen >= target:
+                return le
+        return float("inf")
+
+
+METRICS = TileMetrics()
+
+# ---------------- TILE STORES ----------------
+
+# File-backed stores hand the handler an open file region to sendfile() instead
+# of bytes; "owned" files are closed after the response. Files shared between
+# requests carry a lock for platforms that have to seek them (no pread/sendfile).
+TileFile = namedtuple("TileFile", "file offset length etag owned lock", defaults=(None,))
+
+class TileDirectory:
+    # layout "nested" is tiles/{z}/{x}/{y}.png, "flat" is tiles/{z}_{x}_{y}.png
+    def __init__(self, root, layout="nested"):
+        self.root = root
+        self.layout = layout
+
+    def tile_path(self, z, x, y):
+        if self.layout == "flat":
+            return os.path.join(self.root, f"{z}_{x}_{y}.png")
+        return os.path.join(self.root, str(z), str(x), f"{y}.png")
+
+    def get(self, z, x, y):
+        try:
+            with open(self.tile_path(z, x, y), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def has(self, z, x, y):
+        return os.path.exists(self.tile_path(z, x, y))
+
+    def put(self, z, x, y, data):
+        # Write-then-rename so an interrupted download never leaves a truncated tile
+        path = self.tile_path(z, x, y)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.part"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def open_tile(self, z, x, y):
+        try:
+            f = open(self.tile_path(z, x, y), "rb")
+        except OSError:
+            return None
+        st = os.fstat(f.fileno())
+        etag = f'"{st.st_ino:x}-{st.st_mtime_ns:x}-{st.st_size:x}"'
+        return TileFile(f, 0, st.st_size, etag, True)
+
+    def prefetch(self, z, x, y):
+        # Pull the file into the page cache so the next sendfile() skips the SD card
+        try:
+            fd = os.open(self.tile_path(z, x, y), os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            else:
+                os.read(fd, 1 << 20)
+        finally:
+            os.close(fd)
+
+
+class TileCoverage:
+    # Per-zoom tile bounds plus a bitmap of which tiles exist, in XYZ rows
+    def __init__(self):
+        self.bounds = {}
+        self.bits = {}
+
+    @classmethod
+    def from_mbtiles(cls, conn):
+        cov = cls()
+        for z, x0, x1, r0, r1 in conn.execute(COVERAGE_BOUNDS_QUERY):
+            n = 1 << z
+            y0, y1 = n - 1 - r1, n - 1 - r0
+            cov.bounds[z] = (x0, y0, x1, y1)
+            cov.bits[z] = bytearray(((x1 - x0 + 1) * (y1 - y0 + 1) + 7) // 8)
+        for z, x, r in conn.execute(COVERAGE_TILES_QUERY):
+            cov.add(z, x, (1 << z) - 1 - r)
+        return cov
+
+    def _bit(self, z, x, y):
+        b = self.bounds.get(z)
+        if b is None or not (b[0] <= x <= b[2] and b[1] <= y <= b[3]):
+            return None
+        return (y - b[1]) * (b[2] - b[0] + 1) + (x - b[0])
+
+    def add(self, z, x, y):
+        i = self._bit(z, x, y)
+        if i is not None:
+            self.bits[z][i >> 3] |= 1 << (i & 7)
+
+    def __contains__(self, key):
+        z, x, y = key
+        i = self._bit(z, x, y)
+        return i is not None and bool(self.bits[z][i >> 3] & (1 << (i & 7)))
+
+    def zoom_range(self):
+        if not self.bounds:
+            return None, None
+        return min(self.bounds), max(self.bounds)
+
+    def fallback(self, z, x, y):
+        # Which zoom a missing tile can be resampled from, answered without SQLite
+        z_min, z_max = self.zoom_range()
+        if z_min is None:
+            return None
+        for z_src in range(min(z - 1, z_max), max(z_min, z - MAX_OVERZOOM_LEVELS) - 1, -1):
+            d = z - z_src
+            if (z_src, x >> d, y >> d) in self:
+                return z_src
+        if z_min - MAX_UNDERZOOM_LEVELS <= z < z_min:
+            d = z_min - z
+            for cx in range(x << d, (x + 1) << d):
+                for cy in range(y << d, (y + 1) << d):
+                    if (z_min, cx, cy) in self:
+                        return z + 1
+        return None
+
+
+class MBTilesStore:
+    # Tiles missing from the MBTiles file are resampled from a neighbouring zoom
+    # once and persisted to a side database next to it.
+    def __init__(self, path, derived_path=None):
+        self.path = path
+        self.derived_path = derived_path or path + ".derived"
+        self._db = local()
+        self._derived_checked = False
+        self._derived_lock = Lock()
+        self.coverage = TileCoverage.from_mbtiles(self.connection())
+
+    def connection(self):
+        # One read-only connection per server thread, reused for every request
+        conn = getattr(self._db, "conn", None)
+        if conn is None:
+            uri = pathlib.Path(self.path).resolve().as_uri() + "?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, cached_statements=16)
+            conn.execute("PRAGMA query_only = ON")
+            conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+            self._db.conn = conn
+        return conn
+
+    def derived_connection(self):
+        conn = getattr(self._db, "derived", None)
+        if conn is None:
+            self._check_derived()
+            conn = sqlite3.connect(self.derived_path, timeout=5, cached_statements=16)
+            self._db.derived = conn
+        return conn
+
+    def _check_derived(self):
+        # Derived tiles are only valid for the MBTiles file they were made from
+        with self._derived_lock:
+            if self._derived_checked:
+                return
+            st = os.stat(self.path)
+            source = f"{st.st_size}:{st.st_mtime_ns}"
+            conn = sqlite3.connect(self.derived_path, timeout=5)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute(DERIVED_SCHEMA)
+            conn.execute("CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT)")
+            row = conn.execute("SELECT value FROM metadata WHERE name='source'").fetchone()
+            if row is None or row[0] != source:
+                conn.execute("DELETE FROM derived")
+                conn.execute("INSERT OR REPLACE INTO metadata VALUES ('source', ?)", (source,))
+            conn.commit()
+            conn.close()
+            self._derived_checked = True
+
+    def lookup(self, z, x, y):
+        if (z, x, y) not in self.coverage:
+            return None
+        y_tms = (1 << z) - 1 - y
+        row = self.connection().execute(TILE_QUERY, (z, x, y_tms)).fetchone()
+        return row[0] if row is not None else None
+
+    def zoom_range(self):
+        return self.coverage.zoom_range()
+
+    def get(self, z, x, y):
+        data = self.lookup(z, x, y)
+        if data is None:
+            data = self.derived(z, x, y)
+        return data
+
+    def derived(self, z, x, y):
+        if not 0 <= x < (1 << z) or not 0 <= y < (1 << z):
+            return None
+        z_src = self.coverage.fallback(z, x, y)
+        if z_src is None:
+            return None
+
+        conn = self.derived_connection()
+        y_tms = (1 << z) - 1 - y
+        row = conn.execute(DERIVED_QUERY, (z, x, y_tms)).fetchone()
+        if row is not None:
+            METRICS.count("derived_hits")
+            return row[0]
+
+        with METRICS.stage("resample"):
+            data = self.resample(z, x, y, z_src)
+        if data is not None:
+            METRICS.count("fallbacks")
+            conn.execute(DERIVED_INSERT, (z, x, y_tms, data))
+            conn.commit()
+        return data
+
+    def resample(self, z, x, y, z_src):
+        if z_src < z:
+            # Overzoom: crop the matching quadrant of the nearest stored ancestor
+            d = z - z_src
+            return overzoom_tile(self.lookup(z_src, x >> d, y >> d), d, x, y)
+
+        # Underzoom: composite the 2x2 children, a bounded number of levels down
+        children = [self.get(z + 1, 2 * x + dx, 2 * y + dy) for dy in (0, 1) for dx in (0, 1)]
+        if all(c is None for c in children):
+            return None
+        return underzoom_tile(children)
+
+
+def overzoom_tile(parent, d, x, y):
+    from PIL import Image
+    if d > MAX_OVERZOOM_LEVELS:
+        return None
+    n = 1 << d
+    size = TILE_SIZE // n
+    left = (x % n) * size
+    top = (y % n) * size
+    img = Image.open(io.BytesIO(parent)).convert("RGBA")
+    img = img.crop((left, top, left + size, top + size)).resize((TILE_SIZE, TILE_SIZE), Image.Resampling.LANCZOS)
+    return encode_png(img)
+
+
+def underzoom_tile(children):
+    from PIL import Image
+    canvas = Image.new("RGBA", (2 * TILE_SIZE, 2 * TILE_SIZE))
+    for i, data in enumerate(children):
+        if data is not None:
+            child = Image.open(io.BytesIO(data)).convert("RGBA")
+            canvas.paste(child, ((i % 2) * TILE_SIZE, (i // 2) * TILE_SIZE))
+    return encode_png(canvas.resize((TILE_SIZE, TILE_SIZE), Image.Resampling.LANCZOS))
+
+
+def encode_png(img):
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+# ---------------- TILE CACHE ----------------
+
+class TileCache:
+    # LRU over any tile store, bounded by total tile bytes rather than count.
+    # The tiles:// scheme answers from it without a thread hop and QtWebEngine
+    # keeps no cache of its own for custom schemes, so in-process maps wrap every
+    # store; only HTTP clients of a file-backed store are better served by
+    # sendfile() and the kernel page cache.
+    def __init__(self, store, max_bytes=CACHE_BYTES):
+        self.store = store
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.prefetched = 0
+        self._tiles = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, z, x, y):
+        key = (z, x, y)
+        with self._lock:
+            data = self._tiles.get(key)
+            if data is not None:
+                self._tiles.move_to_end(key)
+                self.hits += 1
+                return data
+            self.misses += 1
+
+        data = self.store.get(z, x, y)
+        if data is not None:
+            self.put(key, data)
+        return data
+
+    def peek(self, key):
+        # The cached bytes or None; never falls through to the backing store
+        with self._lock:
+            data = self._tiles.get(key)
+            if data is not None:
+                self._tiles.move_to_end(key)
+                self.hits += 1
+            return data
+
+    def prefetch(self, z, x, y):
+        # Loads (and for MBTiles, resamples) a tile without touching hit/miss counts
+        key = (z, x, y)
+        if key in self:
+            return
+        data = self.store.get(z, x, y)
+        if data is not None:
+            self.put(key, data)
+            with self._lock:
+                self.prefetched += 1
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._tiles.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._tiles[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self._tiles.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._tiles
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "prefetched": self.prefetched,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "tiles": len(self._tiles),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes
+            }
+
+# ---------------- HTTP SERVER ----------------
+
+class TileHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps Chromium's parallel tile connections open between requests
+    protocol_version = "HTTP/1.1"
+    timeout = KEEPALIVE_TIMEOUT_SEC
+    disable_nagle_algorithm = True
+    store = None
+
+    def log_message(self, *args):
+        return
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path.rstrip("/") == "/metrics":
+            self.send_metrics()
+            return
+
+        parts = path.strip("/").split("/")
+        if len(parts) != 3:
+            METRICS.count("not_found")
+            self.send_error(404)
+            return
+        try:
+            z, x, y_png = parts
+            z = int(z)
+            x = int(x)
+            y = int(y_png.split(".")[0])
+        except ValueError:
+            METRICS.count("bad_request")
+            self.send_error(400)
+            return
+
+        METRICS.count("requests")
+        METRICS.take_inner()
+        t0 = time.perf_counter()
+        if hasattr(self.store, "open_tile"):
+            tile = self.store.open_tile(z, x, y)
+            t1 = time.perf_counter()
+            METRICS.observe("lookup", t1 - t0)
+            if tile is None:
+                METRICS.count("not_found")
+                self.send_error(404)
+                return
+            try:
+                head = read_head(tile, 12)
+                if self.send_tile_headers(tile.etag, tile.length, tile_content_type(head)):
+                    # Tile bytes go file -> socket in the kernel, never through Python.
+                    # Without os.sendfile (Windows) this falls back to seek() and read()
+                    with nullcontext() if hasattr(os, "sendfile") else tile.lock or nullcontext():
+                        self.connection.sendfile(tile.file, tile.offset, tile.length)
+            finally:
+                if tile.owned:
+                    tile.file.close()
+            t2 = time.perf_counter()
+            METRICS.observe("write", t2 - t1)
+            METRICS.observe("total", t2 - t0)
+            return
+
+        data = self.store.get(z, x, y)
+        t1 = time.perf_counter()
+        METRICS.observe("lookup", t1 - t0 - METRICS.take_inner())
+        if data is None:
+            METRICS.count("not_found")
+            self.send_error(404)
+            return
+        if self.send_tile_headers(tile_etag(data), len(data), tile_content_type(data)):
+            self.wfile.write(data)
+        t2 = time.perf_counter()
+        METRICS.observe("write", t2 - t1)
+        METRICS.observe("total", t2 - t0)
+
+    def send_metrics(self):
+        body = json.dumps(METRICS.snapshot(self.store), indent=1).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_tile_headers(self, etag, length, content_type="image/png"):
+        # Returns False when a 304 was sent and no body should follow
+        if self.not_modified(etag):
+            METRICS.count("not_modified")
+            self.send_response(304)
+            self.send_cache_headers(etag)
+            self.end_headers()
+            return False
+
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(length))
+        self.send_cache_headers(etag)
+        self.end_headers()
+        return True
+
+    def not_modified(self, etag):
+        # ETag only: tiles can be rewritten while the server runs (refresh,
+        # recompress), and no single date would be right for all of them
+        match = self.headers.get("If-None-Match")
+        if match is None:
+            return False
+        return match.strip() == "*" or etag in [t.strip() for t in match.split(",")]
+
+    def send_cache_headers(self, etag):
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", f"public, max-age={TILE_MAX_AGE_SEC}")
+
+
+def read_head(tile, n):
+    # First bytes of a tile region, without moving a shared file's position where possible
+    if hasattr(os, "pread"):
+        return os.pread(tile.file.fileno(), n, tile.offset)
+    with tile.lock or nullcontext():
+        tile.file.seek(tile.offset)
+        return tile.file.read(n)
+
+
+def tile_hash(data):
+    # Content key shared by the manifest, the downloader and MBTiles deduplication
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def tile_etag(data):
+    return '"' + hashlib.blake2b(data, digest_size=12).hexdigest() + '"'
+
+
+def tile_content_type(head):
+    # Recompressed tiles keep their .png names; the first bytes say what they are
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[:3] == b"\xff\xd8\xff":
+        return "image/jpeg"
+    return "image/png"
+
+
+class TileHTTPServer(ThreadingHTTPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+def make_server(store, host=HOST, port=PORT):
+    handler = type("BoundTileHandler", (TileHandler,), {"store": store})
+    return TileHTTPServer((host, port), handler)
+
+
+def start_server(store, host=HOST, port=PORT):
+    httpd = make_server(store, host, port)
+    Thread(target=httpd.serve_forever, daemon=True).start()
+    print(f"Serving tiles at http://{host}:{httpd.server_port}/{{z}}/{{x}}/{{y}}.png")
+    return httpd